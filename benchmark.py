@@ -0,0 +1,222 @@
+"""Benchmarks of the loading, slicing and rendering hot paths.
+
+Usage:
+    python benchmark.py [--shape X Y Z] [--dtype uint8|int16|uint16|int32]
+                        [--labels N] [--formats nii nii.gz] [--storage dense sparse]
+                        [--repeat N]
+                        [--render matplotlib qpainter] [--slice-step N]
+                        [--seed N] [--output FILE]
+
+Synthetic label volumes (random ellipsoids, reproducible from ``--seed``)
+are written to a temporary directory in each requested format. For every
+format and label storage (``--storage``, see FILE_CONFIG['sparse_storage'])
+the script times:
+  load_file          cold loads without the decompress cache; also reports
+                     the manager's memory_bytes after loading
+  set_current_label  switching through every label
+  get_slice_data     every slice of every view
+  get_display_data   every slice of every view (precomputed display volumes
+                     when DISPLAY_CONFIG['precompute_display'] is set)
+  get_outline        every slice of every view, uncached then cached
+  render             SliceWidget.update_view under the offscreen Qt platform,
+                     once per backend in ``--render``
+
+Results are written as one JSON document (stdout by default) with the run
+parameters, library versions and per-benchmark statistics in milliseconds,
+so runs can be compared across versions. A summary table goes to stderr.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import nibabel as nib
+
+from config import DISPLAY_CONFIG
+from label_index import VIEW_AXES
+from nifti_utils import NiftiDataManager
+
+DTYPES = ['uint8', 'int16', 'uint16', 'int32']
+
+def make_label_volume(shape, n_labels: int, dtype: str, seed: int) -> np.ndarray:
+    """Volume of ``n_labels`` overlapping ellipsoids on a zero background."""
+    rng = np.random.default_rng(seed)
+    volume = np.zeros(shape, dtype=dtype)
+    dims = np.array(shape)
+    for label in range(1, n_labels + 1):
+        center = rng.integers(0, dims)
+        radii = np.maximum(1, (rng.uniform(0.02, 0.15, 3) * dims).astype(int))
+        lo = np.maximum(0, center - radii)
+        hi = np.minimum(dims, center + radii + 1)
+        x, y, z = np.ogrid[lo[0]:hi[0], lo[1]:hi[1], lo[2]:hi[2]]
+        inside = (((x - center[0]) / radii[0]) ** 2 + ((y - center[1]) / radii[1]) ** 2
+                  + ((z - center[2]) / radii[2]) ** 2) <= 1
+        volume[lo[0]:hi[0], lo[1]:hi[1], lo[2]:hi[2]][inside] = label
+    return volume
+
+def stats(name: str, samples: List[float], **params) -> Dict[str, Any]:
+    ms = np.array(samples) * 1000
+    return {
+        'name': name, **params, 'n': len(ms),
+        'total_ms': float(ms.sum()), 'mean_ms': float(ms.mean()),
+        'median_ms': float(np.median(ms)), 'p95_ms': float(np.percentile(ms, 95)),
+        'max_ms': float(ms.max()),
+    }
+
+def timed(func: Callable, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def bench_data(path: str, repeat: int, slice_step: int, fmt: str, storage: str) -> List[Dict[str, Any]]:
+    results = []
+    loads = []
+    for _ in range(repeat):
+        # Same display precompute setting as the viewer
+        manager = NiftiDataManager(precompute_display=DISPLAY_CONFIG['precompute_display'],
+                                   sparse=storage == 'sparse')
+        loads.append(timed(manager.load_file, path))
+    results.append(stats('load_file', loads, format=fmt, storage=storage,
+                         memory_bytes=manager.memory_bytes))
+
+    # The first switch also builds the display volumes, which shows in max_ms
+    labels = [int(label) for label in manager.label_index.labels]
+    switches = [timed(manager.set_current_label, label) for label in labels]
+    results.append(stats('set_current_label', switches, format=fmt, storage=storage))
+
+    for view, axis in VIEW_AXES.items():
+        samples = [timed(manager.get_slice_data, view, idx)
+                   for idx in range(0, manager.shape[axis], slice_step)]
+        results.append(stats('get_slice_data', samples, format=fmt, storage=storage, view=view))
+
+    for view, axis in VIEW_AXES.items():
+        samples = [timed(manager.get_display_data, view, idx)
+                   for idx in range(0, manager.shape[axis], slice_step)]
+        results.append(stats('get_display_data', samples, format=fmt, storage=storage, view=view))
+
+    # First pass computes and caches outlines, the second is served from the cache
+    for cache in ('cold', 'warm'):
+        for view, axis in VIEW_AXES.items():
+            samples = [timed(manager.get_outline, view, idx)
+                       for idx in range(0, manager.shape[axis], slice_step)]
+            results.append(stats('get_outline', samples, format=fmt, storage=storage, view=view, cache=cache))
+    return results
+
+def bench_render(path: str, backends: List[str], slice_step: int, fmt: str) -> List[Dict[str, Any]]:
+    # The offscreen platform must be chosen before QApplication exists
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt6.QtWidgets import QApplication
+    from main import SliceWidget
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    manager = NiftiDataManager(precompute_display=DISPLAY_CONFIG['precompute_display'])
+    manager.load_file(path)
+    manager.set_current_label(int(manager.label_index.labels[0]))
+
+    results = []
+    default_backend = DISPLAY_CONFIG['render_backend']
+    try:
+        for backend in backends:
+            DISPLAY_CONFIG['render_backend'] = backend
+            for view, axis in VIEW_AXES.items():
+                widget = SliceWidget(view.title())
+                widget.resize(400, 480)
+                widget.show()
+                # First frame creates the canvas; keep it out of the samples
+                widget.update_view(manager.get_display_data(view, 0), 0, manager.get_outline(view, 0))
+                app.processEvents()
+                samples = []
+                for idx in range(0, manager.shape[axis], slice_step):
+                    display = manager.get_display_data(view, idx)
+                    start = time.perf_counter()
+                    widget.update_view(display, idx, manager.get_outline(view, idx))
+                    app.processEvents()
+                    samples.append(time.perf_counter() - start)
+                widget.close()
+                results.append(stats('render', samples, format=fmt, view=view, backend=backend))
+    finally:
+        DISPLAY_CONFIG['render_backend'] = default_backend
+    return results
+
+def environment() -> Dict[str, Any]:
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                  cwd=os.path.dirname(os.path.abspath(__file__)),
+                                  capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        'revision': revision,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'nibabel': nib.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def print_summary(results: List[Dict[str, Any]], out):
+    for result in results:
+        context = ' '.join(str(result[key]) for key in ('format', 'storage', 'view', 'backend', 'cache')
+                           if key in result)
+        print(f"{result['name']:<18} {context:<34} n={result['n']:<5} "
+              f"median {result['median_ms']:>9.3f} ms  p95 {result['p95_ms']:>9.3f} ms",
+              file=out)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark loading, slicing and rendering.")
+    parser.add_argument('--shape', type=int, nargs=3, default=[256, 256, 128], metavar=('X', 'Y', 'Z'))
+    parser.add_argument('--dtype', choices=DTYPES, default='uint8')
+    parser.add_argument('--labels', type=int, default=40)
+    parser.add_argument('--formats', nargs='+', choices=['nii', 'nii.gz'], default=['nii', 'nii.gz'])
+    parser.add_argument('--storage', nargs='+', choices=['dense', 'sparse'], default=['dense'],
+                        help="label volume storage of the data benchmarks")
+    parser.add_argument('--repeat', type=int, default=3, help="cold loads per format")
+    parser.add_argument('--render', nargs='*', choices=['matplotlib', 'qpainter'],
+                        default=['matplotlib', 'qpainter'], help="backends to render (none to skip)")
+    parser.add_argument('--slice-step', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="output file (default: stdout)")
+    args = parser.parse_args(argv)
+    if args.labels < 1 or args.labels > np.iinfo(args.dtype).max:
+        parser.error(f"--labels must be between 1 and {np.iinfo(args.dtype).max} for {args.dtype}")
+
+    volume = make_label_volume(tuple(args.shape), args.labels, args.dtype, args.seed)
+    results = []
+    with tempfile.TemporaryDirectory(prefix='label-tool-bench-') as tmp_dir:
+        paths = {}
+        for fmt in args.formats:
+            paths[fmt] = os.path.join(tmp_dir, f"synthetic.{fmt}")
+            nib.save(nib.Nifti1Image(volume, np.eye(4)), paths[fmt])
+        for fmt, path in paths.items():
+            for storage in args.storage:
+                results.extend(bench_data(path, max(1, args.repeat), max(1, args.slice_step), fmt, storage))
+        if args.render:
+            results.extend(bench_render(paths[args.formats[0]], args.render, max(1, args.slice_step),
+                                            args.formats[0]))
+
+    report = {
+        'params': {'shape': args.shape, 'dtype': args.dtype, 'labels': args.labels,
+                   'formats': args.formats, 'storage': args.storage, 'repeat': args.repeat, 'render': args.render,
+                   'slice_step': args.slice_step, 'seed': args.seed,
+                   'precompute_display': DISPLAY_CONFIG['precompute_display'],
+                   'render_mode': DISPLAY_CONFIG['render_mode']},
+        'environment': environment(),
+        'results': results,
+    }
+    print_summary(results, sys.stderr)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as out:
+            json.dump(report, out, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,4 @@
-import matplotlib.colors as colors
+import os
 
 # UI Configuration
 UI_CONFIG = {
@@ -16,6 +16,8 @@ UI_CONFIG = {
     'file_button_text': "选择文件",
     'load_button_text': "加载数据",
     'theme': 'macOS',
+    'fade_in_ms': 200,            # 窗口淡入动画时长（非阻塞）
+    'startup_timing': False,      # 启动时输出各阶段耗时
     'style': {
         'button': {
             'width': 20,
@@ -47,7 +49,7 @@ UI_CONFIG = {
 DISPLAY_CONFIG = {
     'figure_size': (4, 4),        # 更大的图像尺寸
     'dpi': 100,
-    'cmap': colors.ListedColormap(['#1E1E1E', '#323232', '#007AFF']),  # 更新颜色方案
+    'cmap_colors': ['#1E1E1E', '#323232', '#007AFF'],  # 更新颜色方案（不在此导入matplotlib，保持无界面工具可用）
     'bounds': [0, 1, 2, 3],
     'contour_color': '#007AFF',   # 使用macOS蓝色
     'contour_width': 1.5,         # 更细的轮廓线
@@ -62,14 +64,74 @@ DISPLAY_CONFIG = {
     'text_color': '#FFFFFF',
     'title_weight': 'medium',      # macOS风格的字重
     'title_size': 14,
+    # 'matplotlib' 使用Agg渲染；'qpainter' 通过RGBA查找表直接用QPainter绘制
+    'render_backend': 'matplotlib',
+    # matplotlib后端的模式：'persistent' 复用图像对象并只重绘坐标轴区域；'redraw' 为每帧重建的旧模式
+    'render_mode': 'persistent',
+    'label_colors': [
+        (0, 0, 0, 0.3),        # 半透明黑色背景
+        (0.2, 0.4, 0.8, 0.8),  # 半透明蓝色（其他标签）
+        (1, 0.5, 0, 0.9),      # 橙色（当前标签）
+    ],
+    # 加载影像（CT/MR）底图后的标签配色：背景透明，标签半透明叠加在灰度图上
+    'overlay_label_colors': [
+        (0, 0, 0, 0),
+        (0.2, 0.4, 0.8, 0.35),
+        (1, 0.5, 0, 0.55),
+    ],
+    # 同时显示所有标签：每个标签按标签值取固定的区分色，当前标签使用上面的当前标签颜色
+    'show_all_labels': False,
+    'all_labels_alpha': 0.8,
+    'overlay_all_labels_alpha': 0.45,  # 叠加在影像底图上时
+    'outline_color': (1, 1, 1, 0.7),  # 半透明白色轮廓
+    'axes_background': (0.12, 0.12, 0.15, 0.6),
+    'render_interval_ms': 15,     # 合并滑块渲染请求的间隔
+    'drag_preview': True,         # 拖动滑块时以低质量预览，松开后完整绘制
+    'precompute_display': True,   # 为当前标签预先生成三个方向连续存储的显示体数据
+    'prefetch_slices': 8,         # 沿滑动方向在后台预取的切片数，0为关闭
+    'parallel_views': True,       # 多个视图同时更新时在线程池中并行准备像素
 }
 
 # File Configuration
 FILE_CONFIG = {
     'initial_dir': './data',
-    'file_types': [("NIfTI files", "*.nii.gz")],
+    'file_types': [("NIfTI files", "*.nii.gz *.nii")],
     'icon_path': 'icon/label-tool.ico',
     'file_dialog_title': "选择NIfTI文件",
+    # 解压缓存：.nii.gz 解压一次后以可内存映射的 .npy 保存，按LRU淘汰
+    'cache_enabled': True,
+    'cache_dir': os.path.join(os.path.expanduser('~'), '.cache', 'label-tool'),
+    'cache_max_mb': 4096,
+    # 最近打开的体数据保留在内存中以便快速切换，超出预算时按LRU释放
+    'session_memory_mb': 2048,
+    # 稀疏存储：标签体按32³分块保存，省略全背景块，适合大而稀疏的全身分割；
+    # 启用后不使用解压缓存和预计算显示体
+    'sparse_storage': False,
+    # 保存标签：.nii.gz 按块在多个线程中压缩（0为每个CPU一个线程），级别1与nibabel默认一致；
+    # 保存为 .nii 则不压缩，速度最快
+    'save_compress_level': 1,
+    'save_threads': 0,
+    'save_file_types': [("NIfTI compressed", "*.nii.gz"), ("NIfTI uncompressed", "*.nii")],
+}
+
+# Label editing
+EDIT_CONFIG = {
+    'brush_radius': 3,            # 画笔/橡皮半径（体素）
+    'max_brush_radius': 50,
+    'undo_shortcut': 'Ctrl+Z',
+    'redo_shortcut': 'Ctrl+Shift+Z',
+    'save_shortcut': 'Ctrl+S',
+}
+
+# Performance instrumentation
+PERF_CONFIG = {
+    # 设置后记录加载与渲染各阶段耗时，退出时导出Chrome trace JSON
+    # （可用环境变量 LABEL_TOOL_TRACE 指定，无需修改配置）
+    'trace_file': os.environ.get('LABEL_TOOL_TRACE'),
+    'max_events': 200000,
+    # 在每个视图上显示帧率与帧时间，可用快捷键切换
+    'overlay': False,
+    'overlay_shortcut': 'F12',
 }
 
 # Grid Configuration
@@ -89,6 +151,38 @@ LABELS = {
     'view': 'View',
     'please_load': 'Please load data',
     'file_selected': 'Selected: {}',
+    'cancel_load': 'Cancel',
+    'recent_files': 'Recent Files',
+    'intensity': 'Image Overlay',
+    'load_intensity': 'Load Image',
+    'intensity_hint': 'CT/MR image shown under the labels',
+    'window': 'Window',
+    'level': 'Level',
+    'reset_window': 'Reset Window',
+    'statistics': 'Label Statistics',
+    'stats_columns': ['Label', 'Voxels', 'mL', 'cm²'],
+    'stats_pending': 'Computing statistics… {}%',
+    'export_stats': 'Export Statistics',
+    'edit': 'Edit Labels',
+    'edit_tools': {'view': 'View', 'brush': 'Brush', 'eraser': 'Eraser'},
+    'brush_radius': 'Radius',
+    'edit_value': 'Label',
+    'relabel': 'Relabel',
+    'relabel_hint': 'Change every voxel of the current label to the label value (0 deletes it)',
+    'undo': 'Undo',
+    'redo': 'Redo',
+    'save_labels': 'Save Labels',
+    'unsaved_title': 'Unsaved Changes',
+    'unsaved_close': 'Save the edited labels of {} before closing?',
+    'changed_on_disk': '{} changed on disk since it was loaded. Discard your unsaved edits and reload it?',
+    'load_stages': {
+        'read': 'Reading header',
+        'decompress': 'Decompressing',
+        'sparse': 'Building sparse volume',
+        'index': 'Indexing labels',
+        'cache': 'Writing cache',
+        'save': 'Saving',
+    },
     'description': 'This software is designed to visualize the correspondence between NIfTI file label numbers and their annotated regions.',
 }
 
@@ -96,6 +190,7 @@ LABELS = {
 ERROR_MESSAGES = {
     'no_file': "Please select a file first",
     'load_failed': "Failed to load data",
+    'load_cancelled': "Loading cancelled",
     'update_failed': "Failed to update",
     'invalid_view': "Invalid view",
     'no_data': "No data loaded",
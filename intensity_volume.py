@@ -0,0 +1,144 @@
+import gzip
+import os
+import numpy as np
+import nibabel as nib
+from typing import Optional, Tuple
+
+from label_index import VIEW_AXES
+from perf_trace import tracer
+from progress import ProgressCallback, ProgressReader
+from render_utils import build_window_lut
+from slice_cache import SliceCache
+
+class IntensityVolume:
+    """Grayscale image (CT/MR) shown underneath the labels.
+
+    Each slice is quantised once to uint16 codes and cached. Codes map to
+    grey levels through a 65536-entry lookup table, so a window/level change
+    only rebuilds the table and re-windowing a cached slice is one ``take``.
+    Windowed slices are cached per window as well, for scrolling.
+    """
+
+    CODE_LEVELS = 1 << 16
+    # Voxels sampled for the value range and the default window
+    SAMPLE_VOXELS = 1 << 21
+    CODE_CACHE_BYTES = 128 << 20
+    GRAY_CACHE_BYTES = 32 << 20
+
+    def __init__(self, raw: np.ndarray, slope: float = 1.0, inter: float = 0.0,
+                 header: Optional[nib.Nifti1Header] = None):
+        if raw.ndim > 3 and all(n == 1 for n in raw.shape[3:]):
+            raw = raw.reshape(raw.shape[:3])
+        if raw.ndim != 3:
+            raise ValueError(f"Expected a 3D image, got shape {raw.shape}")
+        self.raw = raw
+        self.shape: Tuple[int, int, int] = raw.shape
+        self.code_cache = SliceCache(self.CODE_CACHE_BYTES)
+        self.gray_cache = SliceCache(self.GRAY_CACHE_BYTES)
+
+        step = max(1, int(np.ceil((raw.size / self.SAMPLE_VOXELS) ** (1 / 3))))
+        sample = np.asarray(raw[::step, ::step, ::step], dtype=np.float64)
+        sample = sample[np.isfinite(sample)]
+        if sample.size == 0:
+            sample = np.zeros(1)
+        # Up to 16-bit integers every stored value has its own code; other
+        # dtypes are quantised over the sampled range
+        self._exact_codes = np.issubdtype(raw.dtype, np.integer) and raw.dtype.itemsize <= 2
+        if self._exact_codes:
+            self._code_offset, self._code_scale = float(np.iinfo(raw.dtype).min), 1.0
+        else:
+            lo, hi = sample.min(), sample.max()
+            self._code_offset = float(lo)
+            self._code_scale = float(hi - lo) / (self.CODE_LEVELS - 1) or 1.0
+        codes = np.arange(self.CODE_LEVELS, dtype=np.float64)
+        self._code_values = (self._code_offset + codes * self._code_scale) * slope + inter
+
+        values = sample * slope + inter
+        self.value_range = (float(values.min()), float(values.max()))
+        cal_min, cal_max = (float(header['cal_min']), float(header['cal_max'])) if header is not None else (0, 0)
+        if cal_max > cal_min:
+            low, high = cal_min, cal_max
+        else:
+            low, high = np.percentile(values, [1, 99])
+        self.default_window = (max(float(high - low), 1e-6), float(low + high) / 2)
+        self.window_id = 0
+        self.set_window(*self.default_window)
+
+    @classmethod
+    @tracer.traced('intensity.load')
+    def load(cls, file_path: str, progress: Optional[ProgressCallback] = None) -> 'IntensityVolume':
+        """Read an image file in its stored dtype; scaling is applied through the LUT.
+
+        Uncompressed files are memory-mapped read-only. For compressed files
+        ``progress`` receives decompression progress, as in load_file.
+        """
+        if progress is not None:
+            progress('read', 0, 1)
+        if not file_path.endswith('.gz'):
+            image = nib.load(file_path, mmap='r')
+            raw = np.asanyarray(image.dataobj.get_unscaled())
+        elif progress is None:
+            image = nib.load(file_path)
+            raw = np.asanyarray(image.dataobj.get_unscaled())
+        else:
+            total = os.path.getsize(file_path)
+            with open(file_path, 'rb') as source:
+                stream = gzip.GzipFile(fileobj=ProgressReader(source, total, progress))
+                image = nib.Nifti1Image.from_stream(stream)
+                raw = np.asanyarray(image.dataobj.get_unscaled())
+        return cls(raw, image.dataobj.slope, image.dataobj.inter, image.header)
+
+    @property
+    def window(self) -> float:
+        return self._window_level[0]
+
+    @property
+    def level(self) -> float:
+        return self._window_level[1]
+
+    def set_window(self, window: float, level: float):
+        """Rebuild the grey-level LUT; slices are re-windowed as they are drawn."""
+        window = max(float(window), 1e-6)
+        lut = build_window_lut(self._code_values, window, level)
+        self._window_level = (window, float(level))
+        self.window_id += 1
+        # The id and its LUT are swapped together for the render threads
+        self._window = (self.window_id, lut)
+
+    def reset_window(self):
+        self.set_window(*self.default_window)
+
+    def slice_codes(self, view: str, slice_idx: int) -> np.ndarray:
+        """uint16 codes of one (x, y) ordered slice, cached read-only."""
+        key = (view, slice_idx)
+        codes = self.code_cache.get(key)
+        if codes is None:
+            axis = VIEW_AXES[view]
+            index = [slice(None)] * 3
+            index[axis] = slice_idx
+            raw = np.asarray(self.raw[tuple(index)])
+            if self._exact_codes:
+                codes = (raw.astype(np.int32) - int(self._code_offset)).astype(np.uint16)
+            else:
+                scaled = np.nan_to_num((raw - self._code_offset) / self._code_scale)
+                codes = np.clip(np.rint(scaled), 0, self.CODE_LEVELS - 1).astype(np.uint16)
+            self.code_cache.put(key, codes)
+        return codes
+
+    @tracer.traced('intensity.get_slice')
+    def get_slice(self, view: str, slice_idx: int) -> np.ndarray:
+        """Windowed uint8 grey slice in (x, y) order, cached per window."""
+        window_id, lut = self._window
+        key = (window_id, view, slice_idx)
+        gray = self.gray_cache.get(key)
+        if gray is None:
+            gray = lut.take(self.slice_codes(view, slice_idx))
+            self.gray_cache.put(key, gray)
+        return gray
+
+    @property
+    def memory_bytes(self) -> int:
+        total = self.code_cache.nbytes + self.gray_cache.nbytes
+        if not isinstance(self.raw, np.memmap):
+            total += self.raw.nbytes
+        return total
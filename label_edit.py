@@ -0,0 +1,84 @@
+import numpy as np
+from typing import List, Optional
+
+class LabelEdit:
+    """One undoable change: flat voxel indices with their old and new values.
+
+    Memory is proportional to the number of changed voxels, not to the
+    volume.
+    """
+
+    def __init__(self, index: np.ndarray, old: np.ndarray, new: np.ndarray):
+        self.index = index
+        self.old = old
+        self.new = new
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def nbytes(self) -> int:
+        return self.index.nbytes + self.old.nbytes + self.new.nbytes
+
+    def merged(self, later: 'LabelEdit') -> 'LabelEdit':
+        """This edit followed by ``later`` as a single edit, e.g. one brush stroke."""
+        index = np.concatenate([self.index, later.index])
+        old = np.concatenate([self.old, later.old])
+        new = np.concatenate([self.new, later.new])
+        # Per voxel keep the value before the first change and after the last
+        _, first = np.unique(index, return_index=True)
+        _, last = np.unique(index[::-1], return_index=True)
+        last = len(index) - 1 - last
+        changed = old[first] != new[last]
+        return LabelEdit(index[first][changed], old[first][changed], new[last][changed])
+
+class EditJournal:
+    """Undo and redo stacks of LabelEdits, bounded in bytes.
+
+    The oldest edits are forgotten once ``max_bytes`` is exceeded; the most
+    recent edit is always kept.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._undo: List[LabelEdit] = []
+        self._redo: List[LabelEdit] = []
+
+    @property
+    def nbytes(self) -> int:
+        return sum(edit.nbytes for edit in self._undo + self._redo)
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def record(self, edit: LabelEdit, merge: bool = False):
+        """Push a new edit, or fold it into the previous one with ``merge``."""
+        if merge and self._undo:
+            edit = self._undo.pop().merged(edit)
+        self._undo.append(edit)
+        self._redo.clear()
+        while len(self._undo) > 1 and self.nbytes > self.max_bytes:
+            self._undo.pop(0)
+
+    def pop_undo(self) -> Optional[LabelEdit]:
+        if not self._undo:
+            return None
+        edit = self._undo.pop()
+        self._redo.append(edit)
+        return edit
+
+    def pop_redo(self) -> Optional[LabelEdit]:
+        if not self._redo:
+            return None
+        edit = self._redo.pop()
+        self._undo.append(edit)
+        return edit
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
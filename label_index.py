@@ -0,0 +1,275 @@
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+
+from perf_trace import tracer
+from progress import ProgressCallback
+from sparse_volume import BlockSparseVolume
+
+# Array axis that each view slices along
+VIEW_AXES = {'axial': 2, 'coronal': 1, 'sagittal': 0}
+
+class LabelIndex:
+    """Per-label voxel counts, bounding boxes and per-axis slice occupancy.
+
+    Built in one pass over the volume, so switching labels and choosing
+    optimal slices never has to scan the voxel data again.
+    """
+
+    # Upper bound on voxels processed per slab while building the index
+    SLAB_VOXELS = 1 << 22
+    # Label values below this are mapped to rows with a direct lookup table
+    MAX_DENSE_RANGE = 4096
+    # Slabs spanning a wider value range are mapped to rows with np.unique
+    MAX_SLAB_RANGE = 1 << 20
+
+    def __init__(self, labels: np.ndarray, counts: np.ndarray,
+                 occupancy: Dict[str, np.ndarray], shape: Tuple[int, int, int]):
+        self.labels = labels
+        self.counts = counts
+        self.occupancy = occupancy
+        self.shape = shape
+        self._rows = {int(label): row for row, label in enumerate(labels)}
+
+        # Inclusive bounding box per label, ordered (x, y, z) like the volume
+        self.bboxes = np.zeros((len(labels), 3, 2), dtype=np.int64)
+        self.optimal = {}
+        for view, axis in VIEW_AXES.items():
+            occ = occupancy[view]
+            if occ.shape[0] == 0:
+                self.optimal[view] = np.zeros(0, dtype=np.int64)
+                continue
+            self.bboxes[:, axis, 0] = np.argmax(occ, axis=1)
+            self.bboxes[:, axis, 1] = occ.shape[1] - 1 - np.argmax(occ[:, ::-1], axis=1)
+            # Middle occupied slice: first index whose running count passes half
+            running = np.cumsum(occ, axis=1)
+            half = running[:, -1] // 2
+            self.optimal[view] = np.argmax(running > half[:, None], axis=1)
+
+    @classmethod
+    @tracer.traced('label_index.build')
+    def build(cls, data, progress: Optional[ProgressCallback] = None) -> 'LabelIndex':
+        """Compute the index for an integer label volume in a single pass.
+
+        ``data`` is an ndarray (or memmap) scanned in z slabs, or a
+        BlockSparseVolume, of which only the stored blocks are scanned.
+        """
+        nx, ny, nz = data.shape
+        sparse = isinstance(data, BlockSparseVolume)
+
+        # Rows are assigned as values are first seen, so the value range never
+        # has to be found with extra passes over the volume; sorted at the end
+        values: List[int] = []
+        row_of: Dict[int, int] = {}
+        counts = np.zeros(0, dtype=np.int64)
+        occ_x = np.zeros((0, nx), dtype=bool)
+        occ_y = np.zeros((0, ny), dtype=bool)
+        occ_z = np.zeros((0, nz), dtype=bool)
+        # 8-bit volumes get one row per possible value up front
+        offset = int(np.iinfo(data.dtype).min) if data.dtype.itemsize == 1 else None
+
+        def add_rows(new_values: List[int]):
+            nonlocal counts, occ_x, occ_y, occ_z
+            for value in new_values:
+                row_of[value] = len(values)
+                values.append(value)
+            grow = len(values) - len(counts)
+            counts = np.concatenate([counts, np.zeros(grow, dtype=np.int64)])
+            occ_x, occ_y, occ_z = (np.concatenate([occ, np.zeros((grow, occ.shape[1]), dtype=bool)])
+                                   for occ in (occ_x, occ_y, occ_z))
+
+        if offset is not None:
+            add_rows(list(range(offset, offset + 256)))
+
+        def to_rows(labels: np.ndarray) -> np.ndarray:
+            if offset is not None:
+                return labels.astype(np.intp) - offset
+            if labels.dtype.itemsize == 2:
+                info = np.iinfo(labels.dtype)
+                lo, hi = int(info.min), int(info.max)
+            else:
+                lo, hi = int(labels.min()), int(labels.max())
+            if hi - lo >= cls.MAX_SLAB_RANGE:
+                present, inverse = np.unique(labels, return_inverse=True)
+                present = present.tolist()
+                new = [value for value in present if value not in row_of]
+                if new:
+                    add_rows(new)
+                local = np.array([row_of[value] for value in present], dtype=np.intp)
+                return local[inverse.reshape(labels.shape)]
+            # Find the values present with one bincount over the (slab's) value range
+            shifted = labels.astype(np.intp) - lo
+            present = (np.flatnonzero(np.bincount(shifted.ravel(), minlength=hi - lo + 1)) + lo).tolist()
+            new = [value for value in present if value not in row_of]
+            if new:
+                add_rows(new)
+            local = np.zeros(hi - lo + 1, dtype=np.intp)
+            local[np.asarray(present) - lo] = [row_of[value] for value in present]
+            return local[shifted]
+
+        def mark(occ: np.ndarray, rows: np.ndarray, coords: np.ndarray):
+            n_values, size = occ.shape
+            occ |= np.bincount((rows * size + coords).ravel(),
+                               minlength=n_values * size).reshape(n_values, size) > 0
+
+        if sparse:
+            # Only stored blocks are visited; coordinates of edge padding are
+            # clipped into the volume, which only ever marks label 0
+            offsets = np.arange(data.block_size)
+            done, total = 0, len(data.blocks)
+            for origins, blocks in data.iter_block_groups(cls.SLAB_VOXELS):
+                if progress is not None:
+                    progress('index', done, total)
+                rows = to_rows(blocks)
+                counts += np.bincount(rows.ravel(), minlength=len(values))
+                mark(occ_x, rows, np.minimum(origins[:, 0, None, None, None]
+                                             + offsets[None, :, None, None], nx - 1))
+                mark(occ_y, rows, np.minimum(origins[:, 1, None, None, None]
+                                             + offsets[None, None, :, None], ny - 1))
+                mark(occ_z, rows, np.minimum(origins[:, 2, None, None, None]
+                                             + offsets[None, None, None, :], nz - 1))
+                done += len(blocks)
+        else:
+            xs = np.arange(nx)[:, None, None]
+            ys = np.arange(ny)[None, :, None]
+            step = max(1, cls.SLAB_VOXELS // max(1, nx * ny))
+            for z0 in range(0, nz, step):
+                if progress is not None:
+                    progress('index', z0, nz)
+                rows = to_rows(np.asarray(data[:, :, z0:z0 + step]))
+                depth = rows.shape[2]
+                zs = np.arange(depth)[None, None, :]
+                n_values = len(values)
+
+                counts += np.bincount(rows.ravel(), minlength=n_values)
+                mark(occ_x, rows, xs)
+                mark(occ_y, rows, ys)
+                occ_z[:, z0:z0 + depth] = np.bincount(
+                    (rows * depth + zs).ravel(),
+                    minlength=n_values * depth).reshape(n_values, depth) > 0
+
+        values = np.array(values, dtype=np.int64)
+        order = np.argsort(values)
+        keep = order[(values[order] > 0) & (counts[order] > 0)]
+        occupancy = {'axial': occ_z[keep], 'coronal': occ_y[keep], 'sagittal': occ_x[keep]}
+        return cls(values[keep], counts[keep], occupancy, (nx, ny, nz))
+
+    @tracer.traced('label_index.apply_edit')
+    def apply_edit(self, coords: Tuple[np.ndarray, np.ndarray, np.ndarray], old: np.ndarray,
+                   new: np.ndarray, data) -> 'LabelIndex':
+        """Index after the voxels at ``coords`` changed from ``old`` to ``new``.
+
+        ``data`` must already hold the new values. Counts change by the
+        edited voxels only; slices that gained a label are marked directly and
+        slices that lost voxels of a label are rechecked inside that label's
+        bounding box, so the work follows the size of the edit.
+        """
+        labels = np.union1d(self.labels, new[new > 0])
+        previous = np.searchsorted(labels, self.labels)
+        counts = np.zeros(len(labels), dtype=np.int64)
+        counts[previous] = self.counts
+        counts += sum_by_label(labels, new) - sum_by_label(labels, old)
+
+        rows_of = label_row_lookup(labels)
+        painted = new > 0
+        occupancy = {}
+        for view, axis in VIEW_AXES.items():
+            occ = np.zeros((len(labels), self.shape[axis]), dtype=bool)
+            occ[previous] = self.occupancy[view]
+            occ[rows_of(new[painted]), coords[axis][painted]] = True
+            occupancy[view] = occ
+
+        for label in np.unique(old[old > 0]):
+            row = int(np.searchsorted(labels, label))
+            if counts[row] == 0:
+                continue
+            lost = old == label
+            bounds = [slice(lo, hi + 1) for lo, hi in self.bbox(label)]
+            for view, axis in VIEW_AXES.items():
+                slices = np.unique(coords[axis][lost])
+                region = list(bounds)
+                region[axis] = slice(int(slices[0]), int(slices[-1]) + 1)
+                others = tuple(a for a in range(3) if a != axis)
+                present = (np.asarray(data[tuple(region)]) == label).any(axis=others)
+                # Voxels of the label painted by this edit may lie outside the old box
+                gained = np.isin(slices, coords[axis][new == label])
+                occupancy[view][row, slices] = present[slices - slices[0]] | gained
+
+        keep = counts > 0
+        return LabelIndex(labels[keep], counts[keep],
+                          {view: occ[keep] for view, occ in occupancy.items()}, self.shape)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Plain arrays for persisting the index (see from_arrays)."""
+        arrays = {'labels': self.labels, 'counts': self.counts,
+                  'shape': np.asarray(self.shape, dtype=np.int64)}
+        for view, occ in self.occupancy.items():
+            arrays[f'occupancy_{view}'] = occ
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'LabelIndex':
+        occupancy = {view: arrays[f'occupancy_{view}'] for view in VIEW_AXES}
+        return cls(arrays['labels'], arrays['counts'], occupancy,
+                   tuple(int(n) for n in arrays['shape']))
+
+    def __contains__(self, label) -> bool:
+        return int(label) in self._rows
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def voxel_count(self, label: int) -> int:
+        """Number of voxels carrying the label (0 if absent)."""
+        row = self._rows.get(int(label))
+        return 0 if row is None else int(self.counts[row])
+
+    def bbox(self, label: int) -> Optional[Tuple[Tuple[int, int], ...]]:
+        """Inclusive ((x0, x1), (y0, y1), (z0, z1)) bounds, or None if absent."""
+        row = self._rows.get(int(label))
+        if row is None:
+            return None
+        return tuple((int(a), int(b)) for a, b in self.bboxes[row])
+
+    def slice_occupancy(self, label: int, view: str) -> np.ndarray:
+        """Boolean array marking the slices of a view that contain the label."""
+        row = self._rows.get(int(label))
+        if row is None:
+            return np.zeros(self.shape[VIEW_AXES[view]], dtype=bool)
+        return self.occupancy[view][row]
+
+    def optimal_slices(self, label: int) -> Optional[Dict[str, int]]:
+        """Middle occupied slice of each view, or None if the label is absent."""
+        row = self._rows.get(int(label))
+        if row is None:
+            return None
+        return {view: int(self.optimal[view][row]) for view in VIEW_AXES}
+
+def label_row_lookup(labels: np.ndarray, first_row: int = 0,
+                     missing: Optional[int] = None) -> Callable[[np.ndarray], np.ndarray]:
+    """Function mapping label values to rows ``first_row + i`` of sorted ``labels``.
+
+    Values that are not in ``labels`` map to ``missing``, by default the row
+    after the last. Small non-negative labels use a direct lookup table,
+    anything else a binary search.
+    """
+    labels = np.asarray(labels)
+    n = len(labels)
+    missing = first_row + n if missing is None else missing
+    if n and 0 <= labels[0] and labels[-1] < LabelIndex.MAX_DENSE_RANGE:
+        # Values above the largest label land on the spare last entry
+        table = np.full(int(labels[-1]) + 2, missing, dtype=np.intp)
+        table[labels.astype(np.intp)] = np.arange(first_row, first_row + n)
+        return lambda values: table[np.clip(values, 0, len(table) - 1)]
+
+    def lookup(values: np.ndarray) -> np.ndarray:
+        rows = np.searchsorted(labels, values).astype(np.intp)
+        found = rows < n
+        found[found] = labels[rows[found]] == values[found]
+        return np.where(found, rows + first_row, missing)
+    return lookup
+
+def sum_by_label(labels: np.ndarray, values: np.ndarray,
+                 weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """Per-label count (or sum of ``weights``) of ``values``; other values are ignored."""
+    rows = label_row_lookup(labels)(values)
+    return np.bincount(rows.ravel(), weights, minlength=len(labels) + 1)[:len(labels)]
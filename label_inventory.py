@@ -0,0 +1,131 @@
+"""Headless label inventory for a directory of NIfTI label files.
+
+Usage:
+    python label_inventory.py [directory] [--format jsonl|csv] [--output FILE]
+                              [--stats] [--workers N] [--max-tasks-per-worker N]
+
+Every file is loaded with NiftiDataManager in a pool of worker processes and
+summarised from its LabelIndex (labels, voxel counts, bounding boxes). With
+``--stats`` each label also gets its physical volume, surface area and
+centroid from one LabelStatistics pass per file.
+Results are streamed as they complete, one JSON object per file or one CSV
+row per label. Neither PyQt6 nor matplotlib is imported.
+"""
+import argparse
+import contextlib
+import csv
+import fnmatch
+import functools
+import json
+import multiprocessing
+import os
+import sys
+from typing import Dict, Any, Iterator, List
+
+from config import FILE_CONFIG
+from nifti_utils import NiftiDataManager
+
+CSV_FIELDS = ['file', 'label', 'voxels', 'x0', 'x1', 'y0', 'y1', 'z0', 'z1']
+STATS_FIELDS = ['volume_mm3', 'surface_mm2', 'centroid_x', 'centroid_y', 'centroid_z']
+
+def find_nifti_files(directory: str) -> List[str]:
+    """Recursively list files matching FILE_CONFIG['file_types'], sorted."""
+    patterns = [pattern for _, spec in FILE_CONFIG['file_types'] for pattern in spec.split()]
+    found = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                found.append(os.path.join(root, name))
+    return sorted(found)
+
+def inventory_file(file_path: str, stats: bool = False) -> Dict[str, Any]:
+    """Load one file and summarise every label from its index."""
+    manager = NiftiDataManager()
+    # load_file reports errors on stdout, which may be the result stream
+    with contextlib.redirect_stdout(sys.stderr):
+        loaded = manager.load_file(file_path)
+    if not loaded:
+        return {'file': file_path, 'error': 'load failed'}
+
+    index = manager.label_index
+    label_stats = manager.get_label_statistics() if stats else None
+    labels = []
+    for label in index.labels:
+        entry = {
+            'label': int(label),
+            'voxels': index.voxel_count(label),
+            'bbox': [list(bounds) for bounds in index.bbox(label)],
+        }
+        if label_stats is not None:
+            record = label_stats.record(label)
+            entry.update((field, record[field]) for field in STATS_FIELDS)
+        labels.append(entry)
+    return {
+        'file': file_path,
+        'shape': [int(n) for n in manager.shape],
+        'dtype': str(manager._data_cache.dtype),
+        'labels': labels,
+    }
+
+def iter_inventory(files: List[str], workers: int, max_tasks: int,
+                   stats: bool = False) -> Iterator[Dict[str, Any]]:
+    """Yield per-file results in completion order.
+
+    Each worker handles one file at a time, so memory per worker is bounded
+    by the largest volume; workers are recycled after ``max_tasks`` files.
+    """
+    task = functools.partial(inventory_file, stats=stats)
+    if workers <= 1:
+        for file_path in files:
+            yield task(file_path)
+        return
+    with multiprocessing.Pool(workers, maxtasksperchild=max_tasks) as pool:
+        yield from pool.imap_unordered(task, files, chunksize=1)
+
+def write_jsonl(results: Iterator[Dict[str, Any]], out):
+    for result in results:
+        out.write(json.dumps(result) + '\n')
+        out.flush()
+
+def write_csv(results: Iterator[Dict[str, Any]], out, stats: bool = False):
+    writer = csv.DictWriter(out, fieldnames=CSV_FIELDS + (STATS_FIELDS if stats else []) + ['error'])
+    writer.writeheader()
+    for result in results:
+        if 'error' in result:
+            writer.writerow({'file': result['file'], 'error': result['error']})
+        for entry in result.get('labels', []):
+            (x0, x1), (y0, y1), (z0, z1) = entry['bbox']
+            row = {'file': result['file'], 'label': entry['label'], 'voxels': entry['voxels'],
+                   'x0': x0, 'x1': x1, 'y0': y0, 'y1': y1, 'z0': z0, 'z1': z1}
+            row.update((field, entry[field]) for field in STATS_FIELDS if field in entry)
+            writer.writerow(row)
+        out.flush()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Inventory labels in NIfTI label files.")
+    parser.add_argument('directory', nargs='?', default=FILE_CONFIG['initial_dir'])
+    parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl')
+    parser.add_argument('--output', help="output file (default: stdout)")
+    parser.add_argument('--stats', action='store_true',
+                        help="add physical volume, surface area and centroid per label")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--max-tasks-per-worker', type=int, default=16)
+    args = parser.parse_args(argv)
+
+    files = find_nifti_files(args.directory)
+    if not files:
+        print(f"No NIfTI files found in {args.directory}", file=sys.stderr)
+        return 1
+
+    workers = max(1, min(args.workers, len(files)))
+    results = iter_inventory(files, workers, args.max_tasks_per_worker, args.stats)
+    write = functools.partial(write_csv, stats=args.stats) if args.format == 'csv' else write_jsonl
+    if args.output:
+        with open(args.output, 'w', newline='', encoding='utf-8') as out:
+            write(results, out)
+    else:
+        write(results, sys.stdout)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
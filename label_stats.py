@@ -0,0 +1,202 @@
+import csv
+import json
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from label_index import LabelIndex, label_row_lookup, sum_by_label
+from perf_trace import tracer
+from progress import ProgressCallback
+
+class LabelStatistics:
+    """Per-label size, position and shape metrics, from one pass over the volume.
+
+    Voxel counts along each axis give the voxel count, centroid and bounding
+    box. Surface area counts voxel faces where the label changes, including
+    faces on the volume border, weighted by the face area from the voxel
+    size; this overestimates smooth surfaces, as any voxel-face measure does.
+    """
+
+    CSV_FIELDS = ['label', 'voxels', 'volume_mm3', 'surface_mm2',
+                  'centroid_x', 'centroid_y', 'centroid_z',
+                  'centroid_world_x', 'centroid_world_y', 'centroid_world_z',
+                  'x0', 'x1', 'y0', 'y1', 'z0', 'z1']
+
+    def __init__(self, labels: np.ndarray, voxels: np.ndarray, centroids: np.ndarray,
+                 bboxes: np.ndarray, faces: np.ndarray, zooms: Tuple[float, float, float],
+                 affine: np.ndarray):
+        self.labels = labels
+        self.voxels = voxels
+        # Voxel-space centroids (n, 3) and inclusive bounding boxes (n, 3, 2)
+        self.centroids = centroids
+        self.bboxes = bboxes
+        # Boundary faces per label with normals along x, y and z
+        self.faces = faces
+        self.zooms = tuple(float(z) for z in zooms)
+        self.affine = affine
+        zx, zy, zz = self.zooms
+        self.volume_mm3 = voxels * (zx * zy * zz)
+        self.surface_mm2 = faces @ np.array([zy * zz, zx * zz, zx * zy])
+        self.centroids_world = centroids @ affine[:3, :3].T + affine[:3, 3]
+        self._rows = {int(label): row for row, label in enumerate(labels)}
+
+    @classmethod
+    @tracer.traced('label_statistics.compute')
+    def compute(cls, data, labels: np.ndarray, zooms: Tuple[float, float, float],
+                affine: np.ndarray, progress: Optional[ProgressCallback] = None) -> 'LabelStatistics':
+        """Compute every label's metrics in a single slab-wise pass.
+
+        ``labels`` are the labels to report, sorted ascending (as in
+        LabelIndex); other values count as background. Work per voxel does
+        not depend on the number of labels.
+        """
+        labels = np.asarray(labels)
+        nx, ny, nz = data.shape
+        n = len(labels)
+        # Other values go to the spare row n
+        to_rows = label_row_lookup(labels)
+
+        def row_counts(rows: np.ndarray) -> np.ndarray:
+            return np.bincount(rows.ravel(), minlength=n + 1)
+
+        def face_counts(rows: np.ndarray, axis: int) -> np.ndarray:
+            # Both sides of every face between different labels
+            a = np.moveaxis(rows, axis, 0)
+            changed = a[1:] != a[:-1]
+            return row_counts(a[1:][changed]) + row_counts(a[:-1][changed])
+
+        per_x = np.zeros((n + 1, nx), dtype=np.int64)
+        per_y = np.zeros((n + 1, ny), dtype=np.int64)
+        per_z = np.zeros((n + 1, nz), dtype=np.int64)
+        faces = np.zeros((n + 1, 3), dtype=np.int64)
+        xs = np.arange(nx)[:, None, None]
+        ys = np.arange(ny)[None, :, None]
+
+        step = max(1, LabelIndex.SLAB_VOXELS // max(1, nx * ny))
+        for z0 in range(0, nz, step):
+            if progress is not None:
+                progress('statistics', z0, nz)
+            # One extra leading slice pairs the faces across slab boundaries
+            start = max(0, z0 - 1)
+            rows = to_rows(np.asarray(data[:, :, start:z0 + step]))
+            own = rows[:, :, z0 - start:]
+            depth = own.shape[2]
+
+            per_x += np.bincount((own * nx + xs).ravel(), minlength=(n + 1) * nx).reshape(n + 1, nx)
+            per_y += np.bincount((own * ny + ys).ravel(), minlength=(n + 1) * ny).reshape(n + 1, ny)
+            per_z[:, z0:z0 + depth] = np.bincount(
+                (own * depth + np.arange(depth)).ravel(),
+                minlength=(n + 1) * depth).reshape(n + 1, depth)
+
+            faces[:, 0] += face_counts(own, 0) + row_counts(own[0]) + row_counts(own[-1])
+            faces[:, 1] += face_counts(own, 1) + row_counts(own[:, 0]) + row_counts(own[:, -1])
+            faces[:, 2] += face_counts(rows, 2)
+            if z0 == 0:
+                faces[:, 2] += row_counts(own[:, :, 0])
+            if z0 + depth == nz:
+                faces[:, 2] += row_counts(own[:, :, -1])
+
+        per_axis = [per_x[:n], per_y[:n], per_z[:n]]
+        voxels = per_x[:n].sum(axis=1)
+        safe = np.maximum(voxels, 1)[:, None]
+        centroids = np.stack([occ @ np.arange(occ.shape[1]) for occ in per_axis], axis=1) / safe
+        bboxes = np.zeros((n, 3, 2), dtype=np.int64)
+        for axis, occ in enumerate(per_axis):
+            present = occ > 0
+            bboxes[:, axis, 0] = np.argmax(present, axis=1)
+            bboxes[:, axis, 1] = occ.shape[1] - 1 - np.argmax(present[:, ::-1], axis=1)
+        return cls(labels, voxels, centroids, bboxes, faces[:n], zooms, affine)
+
+    @tracer.traced('label_statistics.apply_edit')
+    def apply_edit(self, index: LabelIndex, coords: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                   old: np.ndarray, new: np.ndarray, data) -> 'LabelStatistics':
+        """Statistics after the voxels at ``coords`` changed from ``old`` to ``new``.
+
+        ``index`` is the already updated LabelIndex, whose labels, counts and
+        bounding boxes are taken over; ``data`` holds the new values.
+        Centroids are updated from coordinate sums, and surface areas from
+        the six faces of each edited voxel, so only the edit and its direct
+        neighbours are read.
+        """
+        labels = index.labels
+        shape = data.shape
+        previous = label_row_lookup(self.labels)(labels)
+        had = previous < len(self.labels)
+        voxels = index.counts.copy()
+
+        # Centroids are coordinate sums over voxel counts, so the sums are exact integers
+        coord_sums = np.zeros((len(labels), 3))
+        coord_sums[had] = np.rint(self.centroids[previous[had]] * self.voxels[previous[had], None])
+        for axis in range(3):
+            coord_sums[:, axis] += (sum_by_label(labels, new, coords[axis])
+                                    - sum_by_label(labels, old, coords[axis]))
+
+        faces = np.zeros((len(labels), 3), dtype=np.int64)
+        faces[had] = self.faces[previous[had]]
+        flat = np.ravel_multi_index(coords, shape)
+        order = np.argsort(flat)
+        sorted_flat = flat[order]
+
+        def count(values: np.ndarray) -> np.ndarray:
+            return sum_by_label(labels, values).astype(np.int64)
+
+        for axis in range(3):
+            for step in (-1, 1):
+                neighbour = list(coords)
+                neighbour[axis] = coords[axis] + step
+                inside = (neighbour[axis] >= 0) & (neighbour[axis] < shape[axis])
+                # Faces on the volume border belong to the edited voxel alone
+                faces[:, axis] += count(new[~inside]) - count(old[~inside])
+
+                neighbour = tuple(c[inside] for c in neighbour)
+                after = np.asarray(data[neighbour])
+                before = after.copy()
+                pos = np.minimum(np.searchsorted(sorted_flat, np.ravel_multi_index(neighbour, shape)),
+                                 len(sorted_flat) - 1)
+                edited = sorted_flat[pos] == np.ravel_multi_index(neighbour, shape)
+                before[edited] = old[order[pos[edited]]]
+                # A face between two edited voxels is counted once, from its lower side
+                own = ~edited if step < 0 else np.ones(len(after), dtype=bool)
+                old_in, new_in = old[inside][own], new[inside][own]
+                before, after = before[own], after[own]
+                cut_before, cut_after = old_in != before, new_in != after
+                faces[:, axis] += (count(new_in[cut_after]) + count(after[cut_after])
+                                   - count(old_in[cut_before]) - count(before[cut_before]))
+
+        centroids = coord_sums / np.maximum(voxels, 1)[:, None]
+        return LabelStatistics(labels, voxels, centroids, index.bboxes.copy(), faces,
+                               self.zooms, self.affine)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __contains__(self, label) -> bool:
+        return int(label) in self._rows
+
+    def record(self, label: int) -> Optional[Dict[str, float]]:
+        """All metrics of one label as a flat dict (see CSV_FIELDS), or None."""
+        row = self._rows.get(int(label))
+        if row is None:
+            return None
+        (x0, x1), (y0, y1), (z0, z1) = self.bboxes[row].tolist()
+        cx, cy, cz = self.centroids[row].tolist()
+        wx, wy, wz = self.centroids_world[row].tolist()
+        return {
+            'label': int(label), 'voxels': int(self.voxels[row]),
+            'volume_mm3': float(self.volume_mm3[row]), 'surface_mm2': float(self.surface_mm2[row]),
+            'centroid_x': cx, 'centroid_y': cy, 'centroid_z': cz,
+            'centroid_world_x': wx, 'centroid_world_y': wy, 'centroid_world_z': wz,
+            'x0': x0, 'x1': x1, 'y0': y0, 'y1': y1, 'z0': z0, 'z1': z1,
+        }
+
+    def records(self) -> List[Dict[str, float]]:
+        return [self.record(label) for label in self.labels]
+
+    def export(self, path: str):
+        """Write every label's metrics as JSON (``.json``) or CSV (otherwise)."""
+        with open(path, 'w', newline='', encoding='utf-8') as out:
+            if path.lower().endswith('.json'):
+                json.dump({'zooms': list(self.zooms), 'labels': self.records()}, out, indent=2)
+            else:
+                writer = csv.DictWriter(out, fieldnames=self.CSV_FIELDS)
+                writer.writeheader()
+                writer.writerows(self.records())
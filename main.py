@@ -1,24 +1,44 @@
 import sys
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+# 启动计时从导入Qt之前开始
+_STARTUP_T0 = time.perf_counter()
+
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QPushButton,
                            QVBoxLayout, QHBoxLayout, QComboBox, QFileDialog,
-                           QLabel, QFrame, QMessageBox, QSlider)
-from PyQt6.QtCore import Qt, pyqtSignal, QTimer
-from PyQt6.QtGui import QIcon, QPalette, QColor
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
+                           QLabel, QFrame, QMessageBox, QSlider, QProgressBar,
+                           QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView,
+                           QButtonGroup, QSpinBox)
+from PyQt6.QtCore import Qt, pyqtSignal, QTimer, QThread, QObject, QPropertyAnimation, QEvent
+from PyQt6.QtGui import QIcon, QPalette, QColor, QShortcut, QKeySequence
+
+from config import (UI_CONFIG, FILE_CONFIG, DISPLAY_CONFIG, GRID_CONFIG, PERF_CONFIG, EDIT_CONFIG,
+                    LABELS, ERROR_MESSAGES)
+from perf_trace import tracer, FrameStats
 
-# 用于调试 - 打印当前文件信息
-print(f"运行文件: {__file__}")
-print(f"文件修改时间: {os.path.getmtime(__file__)}")
-print(f"Python版本: {sys.version}")
+# numpy/nibabel（nifti_utils）和matplotlib（slice_canvas）在首次加载数据时才导入，
+# 窗口无需等待这些模块即可显示
 
-import numpy as np
-import matplotlib.font_manager as fm
+class StartupTimer:
+    """记录启动各阶段的耗时，窗口首次绘制后输出"""
 
-from config import UI_CONFIG, FILE_CONFIG, DISPLAY_CONFIG, GRID_CONFIG, LABELS, ERROR_MESSAGES
-from nifti_utils import NiftiDataManager
+    def __init__(self, t0: float):
+        self._last = t0
+        self._t0 = t0
+        self.phases = []
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self._last) * 1000))
+        self._last = now
+
+    def report(self) -> str:
+        total = (self._last - self._t0) * 1000
+        parts = ", ".join(f"{phase} {ms:.0f} ms" for phase, ms in self.phases)
+        return f"Startup: {parts} (total {total:.0f} ms)"
 
 class DarkPalette(QPalette):
     def __init__(self):
@@ -31,12 +51,197 @@ class DarkPalette(QPalette):
         self.setColor(QPalette.ColorRole.Button, QColor(40, 40, 50, 200))  # 半透明按钮背景
         self.setColor(QPalette.ColorRole.ButtonText, QColor(230, 230, 230, 250))
 
+class VolumeLoadWorker(QThread):
+    """在后台线程中加载NIfTI文件，避免阻塞界面"""
+    progress = pyqtSignal(str, int, int)
+    loaded = pyqtSignal(str, object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, file_path: str, cache=None, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.cache = cache
+        self._cancel_requested = False
+        self._last_report = None
+
+    def cancel(self):
+        self._cancel_requested = True
+
+    def _report(self, stage: str, done: int, total: int):
+        from progress import LoadCancelled
+        # 在加载的每个检查点响应取消请求
+        if self._cancel_requested:
+            raise LoadCancelled()
+        # 只在百分比变化时发出信号，避免淹没事件队列
+        report = (stage, done * 100 // total if total else 0)
+        if report != self._last_report:
+            self._last_report = report
+            self.progress.emit(stage, done, total)
+
+    def run(self):
+        from nifti_utils import NiftiDataManager
+        from progress import LoadCancelled
+        manager = NiftiDataManager(self.cache, DISPLAY_CONFIG['precompute_display'],
+                                   FILE_CONFIG['sparse_storage'])
+        try:
+            if manager.load_file(self.file_path, progress=self._report):
+                self.loaded.emit(self.file_path, manager)
+            else:
+                self.failed.emit(ERROR_MESSAGES['load_failed'])
+        except LoadCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(f"Failed to load data: {str(e)}")
+
+class IntensityLoadWorker(VolumeLoadWorker):
+    """在后台线程中读取与标签配对的影像（CT/MR）体数据"""
+
+    def run(self):
+        from intensity_volume import IntensityVolume
+        from progress import LoadCancelled
+        try:
+            volume = IntensityVolume.load(self.file_path, progress=self._report)
+            # 读取完成后再检查一次取消请求
+            self._report('read', 1, 1)
+            self.loaded.emit(self.file_path, volume)
+        except LoadCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(f"Failed to load image: {str(e)}")
+
+class LabelSaveWorker(VolumeLoadWorker):
+    """在后台线程中保存（并压缩）编辑后的标签，完成时发出loaded"""
+
+    def __init__(self, file_path: str, manager: 'NiftiDataManager', parent=None):
+        super().__init__(file_path, parent=parent)
+        self.manager = manager
+
+    def run(self):
+        from progress import LoadCancelled
+        try:
+            self.manager.save_file(self.file_path, FILE_CONFIG['save_compress_level'],
+                                   FILE_CONFIG['save_threads'], progress=self._report)
+            self.loaded.emit(self.file_path, self.manager)
+        except LoadCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(f"Failed to save labels: {str(e)}")
+
+class StatisticsWorker(QThread):
+    """在后台线程中一次遍历体数据，计算所有标签的统计量（结果保存在manager中）"""
+    progress = pyqtSignal(int)
+    computed = pyqtSignal(object, object)
+
+    def __init__(self, manager: 'NiftiDataManager', parent=None):
+        super().__init__(parent)
+        self.manager = manager
+        # 计算期间标签被编辑时结果不会保存，结束后需要重新计算
+        self.version = manager.edit_version
+        self._cancel_requested = False
+        self._last_percent = None
+
+    def cancel(self):
+        self._cancel_requested = True
+
+    def _report(self, stage: str, done: int, total: int):
+        from progress import LoadCancelled
+        if self._cancel_requested:
+            raise LoadCancelled()
+        percent = done * 100 // total if total else 0
+        if percent != self._last_percent:
+            self._last_percent = percent
+            self.progress.emit(percent)
+
+    def run(self):
+        from progress import LoadCancelled
+        try:
+            stats = self.manager.get_label_statistics(self._report)
+        except LoadCancelled:
+            return
+        except Exception as e:
+            print(f"Error computing label statistics: {e}")
+            return
+        self.computed.emit(self.manager, stats)
+
+class RenderScheduler(QObject):
+    """合并滑块产生的渲染请求：每个视图只保留最新的一次，由定时器统一刷新"""
+
+    def __init__(self, render, interval_ms: int, parent=None):
+        super().__init__(parent)
+        self._render = render
+        self._pending = []
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self._flush)
+
+    def request(self, view: str):
+        # 过期的请求被丢弃：渲染时读取的是该视图的最新切片位置
+        if view not in self._pending:
+            self._pending.append(view)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def cancel(self):
+        self._pending = []
+        self._timer.stop()
+
+    def _flush(self):
+        pending, self._pending = self._pending, []
+        for view in pending:
+            self._render(view)
+
+class SlicePrefetcher:
+    """沿滑动方向在工作线程中预先计算后续切片的显示数据和轮廓
+
+    每个视图只有最新一次请求有效：新的请求或取消会让旧任务在下一张切片前退出。
+    """
+
+    def __init__(self, count: int):
+        self.count = count
+        self._executor = None
+        self._tokens = {}
+
+    def request(self, manager: 'NiftiDataManager', view: str, position: int, direction: int,
+                all_labels: bool = False):
+        if self.count <= 0 or direction == 0:
+            return
+        from label_index import VIEW_AXES
+        token = self._tokens.get(view, 0) + 1
+        self._tokens[view] = token
+        step = 1 if direction > 0 else -1
+        last = manager.shape[VIEW_AXES[view]] - 1
+        slices = [idx for idx in range(position + step, position + step * (self.count + 1), step)
+                  if 0 <= idx <= last]
+        if not slices:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch')
+        self._executor.submit(manager.prefetch_slices, manager.current_label, view, slices,
+                              lambda: self._tokens.get(view) == token, all_labels)
+
+    def cancel(self):
+        for view in self._tokens:
+            self._tokens[view] += 1
+
+    def shutdown(self):
+        self.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
 class SliceWidget(QFrame):
     slice_changed = pyqtSignal(str, int)
+    # 编辑笔画：(视图, 切片行, 切片列, 是否为笔画起点)，松开鼠标时发出edit_finished
+    edit_stroke = pyqtSignal(str, int, int, bool)
+    edit_finished = pyqtSignal()
 
     def __init__(self, view: str, parent=None):
         super().__init__(parent)
         self.view = view
+        self.editing = False
+        self._stroking = False
+        self._stroke_started = False
         self.setup_ui()
         # 设置毛玻璃效果
         self.setStyleSheet(f"""
@@ -48,6 +253,19 @@ class SliceWidget(QFrame):
         """)
         self.setObjectName(f"slice_{self.view.lower()}")
 
+        # 帧率/帧时间叠加层，浮在画布左上角，默认隐藏
+        self.frame_stats = FrameStats()
+        self.perf_label = QLabel(self)
+        self.perf_label.setStyleSheet("""
+            color: rgba(120, 255, 120, 230);
+            font-family: monospace;
+            font-size: 9pt;
+            padding: 2px 4px;
+            background-color: rgba(0, 0, 0, 150);
+            border-radius: 3px;
+        """)
+        self.perf_label.hide()
+
     def setup_ui(self):
         layout = QVBoxLayout(self)
         layout.setContentsMargins(8, 8, 8, 12)
@@ -69,29 +287,17 @@ class SliceWidget(QFrame):
         """)
         layout.addWidget(self.title_label)
 
-        # 创建带透明背景的matplotlib图形
-        self.figure = Figure(figsize=DISPLAY_CONFIG['figure_size'])
-        self.figure.patch.set_facecolor((0, 0, 0, 0))  # 完全透明背景
-        
-        # 设置matplotlib字体属性以避免非英文文本的警告
-        self.font_prop = fm.FontProperties(family='Arial')
-        
-        # 创建子图
-        self.ax = self.figure.add_subplot(111)
-        self.ax.set_facecolor((0.12, 0.12, 0.15, 0.6))  # 半透明背景
-        
-        # 完全移除坐标轴
-        self.ax.set_axis_off()
-        
-        # 调整子图参数
-        self.figure.subplots_adjust(left=0, right=1, bottom=0, top=1, wspace=0, hspace=0)
-        
-        self.canvas = FigureCanvas(self.figure)
-        self.canvas.setStyleSheet(f"""
-            background-color: transparent;
-            border: none;
+        # 画布在第一次显示数据时才创建，之前用轻量的占位标签代替
+        self.canvas = None
+        self.placeholder = QLabel(LABELS['please_load'])
+        self.placeholder.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.placeholder.setMinimumSize(100, 100)
+        self.placeholder.setStyleSheet(f"""
+            color: rgba(255, 255, 255, 204);
+            font-size: {UI_CONFIG['font_size']}pt;
+            background-color: rgba(31, 31, 38, 153);
         """)
-        layout.addWidget(self.canvas)
+        layout.addWidget(self.placeholder, 1)
 
         # 创建滑块
         slider_layout = QVBoxLayout()
@@ -114,6 +320,8 @@ class SliceWidget(QFrame):
         self.slider.setMinimum(0)
         self.slider.setMaximum(0)
         self.slider.valueChanged.connect(self._on_slice_changed)
+        # 松开滑块时再请求一次，以完整质量重绘预览帧
+        self.slider.sliderReleased.connect(lambda: self._on_slice_changed(self.slider.value()))
         self.slider.setStyleSheet(f"""
             QSlider {{
                 margin: 4px 0px;
@@ -139,79 +347,125 @@ class SliceWidget(QFrame):
 
         layout.addLayout(slider_layout)
 
-        # 初始化空图表 - 使用fontproperties避免缺失字形警告
-        self.ax.text(0.5, 0.5, LABELS['please_load'],
-                    ha='center', va='center', 
-                    fontsize=UI_CONFIG['font_size'],
-                    color=(1, 1, 1, 0.8),  # 使用matplotlib支持的元组格式(r,g,b,a)
-                    fontproperties=self.font_prop)
-        self.ax.set_xticks([])
-        self.ax.set_yticks([])
-        self.canvas.draw()
-
     def _on_slice_changed(self, value):
         self.slice_changed.emit(self.view.lower(), value)
         self.slice_label.setText(f"{LABELS['slice']}: {value}")
 
-    def update_view(self, data: np.ndarray, mask: np.ndarray, slice_idx: int):
-        self.ax.clear()
-        
-        # 确保深色背景
-        self.ax.set_facecolor((0.12, 0.12, 0.15, 0.6))
-        
-        # 完全移除坐标轴
-        self.ax.set_axis_off()
-        
-        # 使用精确范围显示数据
-        height, width = data.T.shape
-        # 创建用于可视化的彩色遮罩
-        colored_data = np.zeros_like(data)  # 将所有数据设置为0（背景）
-        colored_data[data > 0] = 1  # 将脑组织设置为1（未标记/蓝色）
-        colored_data[mask > 0.5] = 2  # 将标记区域设置为2（橙色）
-        
-        # 使用更明亮的渐变色彩图，搭配毛玻璃效果
-        custom_cmap = plt.cm.get_cmap('cool', 3)
-        # 修改第一个颜色为透明黑色（背景）
-        colors = custom_cmap(np.arange(3))
-        colors[0] = [0, 0, 0, 0.3]  # 半透明黑色背景
-        colors[1] = [0.2, 0.4, 0.8, 0.8]  # 半透明蓝色（脑组织）
-        colors[2] = [1, 0.5, 0, 0.9]  # 橙色（标记区域）
-        custom_cmap = plt.matplotlib.colors.ListedColormap(colors)
-        
-        self.ax.imshow(colored_data.T, 
-                      extent=(-0.5, width-0.5, -0.5, height-0.5),
-                      cmap=custom_cmap,
-                      norm=plt.Normalize(0, 2),  # 明确设置范围从0到2
-                      origin=DISPLAY_CONFIG['origin'],
-                      interpolation='bilinear')  # 使用双线性插值使图像更平滑
-        
-        # 添加具有相同范围的轮廓
-        self.ax.contour(np.arange(width), np.arange(height), mask.T,
-                       levels=[0.5],
-                       colors=[(1, 1, 1, 0.7)],  # 半透明白色轮廓 - 已经是正确的元组格式
-                       linewidths=1.5)
-        
+    def is_dragging(self) -> bool:
+        return self.slider.isSliderDown()
+
+    def set_perf_overlay(self, visible: bool):
+        self.perf_label.setVisible(visible)
+        self._place_perf_label()
+
+    def record_frame(self, duration_s: float):
+        # 记录一帧（取数据 + 绘制）的耗时，并刷新叠加层文字
+        self.frame_stats.add(duration_s)
+        if self.perf_label.isVisible():
+            stats = self.frame_stats
+            self.perf_label.setText(f"{stats.fps:.0f} fps  {stats.last_ms:.1f} ms  max {stats.max_ms:.1f} ms")
+            self.perf_label.adjustSize()
+
+    def _place_perf_label(self):
+        title = self.title_label.geometry()
+        self.perf_label.move(title.left() + 4, title.bottom() + 6)
+        self.perf_label.raise_()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._place_perf_label()
+
+    def set_slice_count(self, count: int):
+        # 按体数据在该视图方向上的切片数设置滑块范围
+        self.slider.blockSignals(True)
+        self.slider.setMaximum(max(0, count - 1))
+        self.slider.blockSignals(False)
+
+    def ensure_canvas(self):
+        # 根据配置创建matplotlib或QPainter画布，并替换占位标签
+        if self.canvas is not None:
+            return
+        from slice_canvas import create_slice_canvas
+        self.canvas = create_slice_canvas()
+        self.layout().replaceWidget(self.placeholder, self.canvas)
+        self.placeholder.deleteLater()
+        self.placeholder = None
+        self.perf_label.raise_()
+        self.canvas.installEventFilter(self)
+        self.set_editing(self.editing)
+
+    def set_editing(self, editing: bool):
+        # 编辑工具激活时画布上的鼠标操作用于绘制
+        self.editing = editing
+        if self.canvas is not None:
+            self.canvas.setCursor(Qt.CursorShape.CrossCursor if editing else Qt.CursorShape.ArrowCursor)
+
+    def eventFilter(self, obj, event):
+        if obj is not self.canvas or not self.editing:
+            return super().eventFilter(obj, event)
+        kind = event.type()
+        if kind == QEvent.Type.MouseButtonPress and event.button() == Qt.MouseButton.LeftButton:
+            self._stroking = True
+            self._stroke_started = False
+            self._emit_stroke(event)
+            return True
+        if kind == QEvent.Type.MouseMove and self._stroking:
+            self._emit_stroke(event)
+            return True
+        if kind == QEvent.Type.MouseButtonRelease and self._stroking:
+            self._stroking = False
+            self.edit_finished.emit()
+            return True
+        return super().eventFilter(obj, event)
+
+    def _emit_stroke(self, event):
+        # 笔画从第一个落在切片上的位置开始
+        position = self.canvas.slice_position(event.position())
+        if position is not None:
+            self.edit_stroke.emit(self.view.lower(), position[0], position[1], not self._stroke_started)
+            self._stroke_started = True
+
+    def update_view(self, display: 'np.ndarray', slice_idx: int, outline: Optional['np.ndarray'] = None,
+                    base: Optional['np.ndarray'] = None, palette: Optional['np.ndarray'] = None):
+        # display 为 0（背景）/ 1（其他标签）/ 2（当前标签）的uint8切片，
+        # 给出palette时则为调色板索引切片（显示全部标签）；
+        # outline 为当前标签的边缘遮罩；为None时是拖动预览，不画轮廓；
+        # base 为窗宽窗位映射后的影像灰度切片，没有影像时为None
+        self.ensure_canvas()
+        self.show_prepared(self.canvas.prepare_slice(display, outline, base, palette), slice_idx)
+
+    def show_prepared(self, prepared, slice_idx: int):
+        # prepared 来自 canvas.prepare_slice，可能在工作线程中生成
+        with tracer.span('draw_slice', view=self.view.lower()):
+            self.canvas.show_prepared(prepared)
+
         # 更新Qt标签中的切片文本（不是在matplotlib中）
         self.slice_label.setText(f"{LABELS['slice']}: {slice_idx}")
-        
-        # 移除刻度并确保坐标轴不扩展
-        self.ax.set_axis_off()
-        self.ax.set_xlim(-0.5, width-0.5)
-        self.ax.set_ylim(-0.5, height-0.5)
-        
-        # 更新滑块
-        if self.slider.maximum() == 0:
-            self.slider.setMaximum(data.shape[0] - 1)
+
+        # 同步滑块位置，屏蔽信号以免再次触发同一切片的渲染
+        self.slider.blockSignals(True)
         self.slider.setValue(slice_idx)
-        
-        # 确保紧凑布局并重绘
-        self.figure.tight_layout()
-        self.canvas.draw()
+        self.slider.blockSignals(False)
 
 class ControlPanel(QFrame):
     file_selected = pyqtSignal()
     load_clicked = pyqtSignal()
+    cancel_clicked = pyqtSignal()
+    recent_selected = pyqtSignal(str)
     label_changed = pyqtSignal(int)
+    all_labels_toggled = pyqtSignal(bool)
+    intensity_selected = pyqtSignal()
+    window_changed = pyqtSignal(float, float)
+    window_reset = pyqtSignal()
+    stats_export = pyqtSignal()
+    edit_tool_changed = pyqtSignal(str)
+    undo_clicked = pyqtSignal()
+    redo_clicked = pyqtSignal()
+    relabel_clicked = pyqtSignal(int)
+    save_clicked = pyqtSignal()
+
+    # 窗宽窗位滑块的刻度数，对应影像的整个取值范围
+    WINDOW_STEPS = 1000
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -313,6 +567,88 @@ class ControlPanel(QFrame):
         self.load_button.setCursor(Qt.CursorShape.PointingHandCursor)
         self.content_layout.addWidget(self.load_button)
 
+        # 加载进度区域，仅在后台加载时显示
+        self.progress_widget = QWidget()
+        progress_layout = QVBoxLayout(self.progress_widget)
+        progress_layout.setContentsMargins(0, 0, 0, 0)
+        progress_layout.setSpacing(6)
+
+        self.progress_label = QLabel("")
+        self.progress_label.setWordWrap(True)
+        self.progress_label.setStyleSheet(f"""
+            color: rgba(255, 255, 255, 200);
+            font-size: {UI_CONFIG['font_size'] - 1}pt;
+            padding-left: 2px;
+        """)
+        progress_layout.addWidget(self.progress_label)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setTextVisible(False)
+        self.progress_bar.setFixedHeight(8)
+        self.progress_bar.setStyleSheet("""
+            QProgressBar {
+                background-color: rgba(60, 60, 80, 180);
+                border: none;
+                border-radius: 4px;
+            }
+            QProgressBar::chunk {
+                background-color: rgba(70, 130, 180, 220);
+                border-radius: 4px;
+            }
+        """)
+        progress_layout.addWidget(self.progress_bar)
+
+        self.cancel_button = QPushButton(LABELS['cancel_load'])
+        self.cancel_button.setStyleSheet(button_style)
+        self.cancel_button.clicked.connect(self.cancel_clicked.emit)
+        self.cancel_button.setCursor(Qt.CursorShape.PointingHandCursor)
+        progress_layout.addWidget(self.cancel_button)
+
+        self.progress_widget.setVisible(False)
+        self.content_layout.addWidget(self.progress_widget)
+
+        # 最近打开的体数据，保留在内存中可以立即切换
+        self.recent_widget = QWidget()
+        recent_layout = QVBoxLayout(self.recent_widget)
+        recent_layout.setContentsMargins(0, 0, 0, 0)
+        recent_layout.setSpacing(4)
+
+        recent_title = QLabel(LABELS['recent_files'])
+        recent_title.setStyleSheet(f"""
+            color: rgba(255, 255, 255, 200);
+            font-size: {UI_CONFIG['font_size'] - 1}pt;
+            padding-left: 2px;
+        """)
+        recent_layout.addWidget(recent_title)
+
+        self.recent_combo = QComboBox()
+        self.recent_combo.setStyleSheet(f"""
+            QComboBox {{
+                background-color: rgba(40, 40, 60, 180);
+                color: rgba(255, 255, 255, 240);
+                border-radius: 8px;
+                padding: 6px 10px;
+                border: 1px solid rgba(255, 255, 255, 40);
+                font-size: {UI_CONFIG['font_size'] - 1}pt;
+            }}
+            QComboBox:hover {{
+                background-color: rgba(60, 60, 80, 220);
+                border: 1px solid rgba(255, 255, 255, 60);
+            }}
+            QComboBox QAbstractItemView {{
+                background-color: rgba(45, 45, 65, 245);
+                color: rgba(255, 255, 255, 240);
+                selection-background-color: rgba(70, 130, 180, 200);
+            }}
+        """)
+        self.recent_combo.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.recent_combo.activated.connect(self._on_recent_activated)
+        recent_layout.addWidget(self.recent_combo)
+
+        self.recent_widget.setVisible(False)
+        self.content_layout.addWidget(self.recent_widget)
+
         # 标签选择带毛玻璃效果
         frame_style = f"""
             QFrame {{
@@ -500,10 +836,324 @@ class ControlPanel(QFrame):
         self.refresh_button.setCursor(Qt.CursorShape.PointingHandCursor)
         self.refresh_button.clicked.connect(self._refresh_labels)
         buttons_layout.addWidget(self.refresh_button)
+
+        # 同时显示所有标签，每个标签一种颜色，当前标签高亮
+        self.all_labels_button = QPushButton("全部")
+        self.all_labels_button.setToolTip("同时显示所有标签")
+        self.all_labels_button.setCheckable(True)
+        self.all_labels_button.setChecked(DISPLAY_CONFIG['show_all_labels'])
+        self.all_labels_button.setStyleSheet(f"""
+            QPushButton {{
+                background-color: rgba(60, 60, 90, 150);
+                color: rgba(255, 255, 255, 220);
+                padding: 6px 10px;
+                border-radius: 6px;
+                font-size: {UI_CONFIG['font_size'] - 1}pt;
+                border: 1px solid rgba(255, 255, 255, 30);
+                min-width: 40px;
+            }}
+            QPushButton:hover {{
+                background-color: rgba(70, 70, 100, 180);
+                border: 1px solid rgba(255, 255, 255, 50);
+            }}
+            QPushButton:checked {{
+                background-color: rgba(70, 130, 180, 200);
+                border: 1px solid rgba(255, 255, 255, 60);
+            }}
+        """)
+        self.all_labels_button.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.all_labels_button.toggled.connect(self.all_labels_toggled)
+        buttons_layout.addWidget(self.all_labels_button)
         
         label_layout.addLayout(buttons_layout)
         
         self.content_layout.addWidget(label_frame)
+
+        # 数值标签（编辑、窗宽窗位和统计区域共用）
+        value_style = f"""
+            color: rgba(255, 255, 255, 200);
+            font-size: {UI_CONFIG['font_size'] - 1}pt;
+            padding-left: 2px;
+            border: none;
+            background: transparent;
+        """
+
+        # 标签编辑：画笔、橡皮、重新标记与撤销/重做
+        edit_frame = QFrame()
+        edit_frame.setFrameStyle(QFrame.Shape.NoFrame)
+        edit_frame.setStyleSheet(frame_style)
+        edit_layout = QVBoxLayout(edit_frame)
+        edit_layout.setContentsMargins(12, 12, 12, 12)
+        edit_layout.setSpacing(8)
+
+        edit_title_layout = QHBoxLayout()
+        edit_title_layout.setSpacing(8)
+        edit_icon = QLabel("✏️")
+        edit_icon.setStyleSheet(f"""
+            font-size: {UI_CONFIG['title_font_size'] + 2}pt;
+            color: rgba(255, 255, 255, 240);
+        """)
+        edit_title_layout.addWidget(edit_icon)
+        edit_title = QLabel(LABELS['edit'])
+        edit_title.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
+        edit_title.setStyleSheet(f"""
+            color: rgba(255, 255, 255, 240);
+            font-weight: bold;
+            font-size: {UI_CONFIG['title_font_size']}pt;
+        """)
+        edit_title_layout.addWidget(edit_title)
+        edit_title_layout.addStretch()
+        edit_layout.addLayout(edit_title_layout)
+
+        tool_button_style = f"""
+            QPushButton {{
+                background-color: rgba(60, 60, 90, 150);
+                color: rgba(255, 255, 255, 220);
+                padding: 6px 8px;
+                border-radius: 6px;
+                font-size: {UI_CONFIG['font_size'] - 1}pt;
+                border: 1px solid rgba(255, 255, 255, 30);
+            }}
+            QPushButton:hover {{
+                background-color: rgba(70, 70, 100, 180);
+                border: 1px solid rgba(255, 255, 255, 50);
+            }}
+            QPushButton:checked {{
+                background-color: rgba(70, 130, 180, 200);
+                border: 1px solid rgba(255, 255, 255, 60);
+            }}
+            QPushButton:disabled {{
+                color: rgba(255, 255, 255, 90);
+            }}
+        """
+        spin_style = f"""
+            QSpinBox {{
+                background-color: rgba(60, 60, 80, 180);
+                color: rgba(255, 255, 255, 240);
+                border: 1px solid rgba(255, 255, 255, 30);
+                border-radius: 6px;
+                padding: 4px;
+                font-size: {UI_CONFIG['font_size'] - 1}pt;
+            }}
+        """
+
+        # 工具互斥：浏览时鼠标不修改标签
+        tools_layout = QHBoxLayout()
+        tools_layout.setSpacing(6)
+        self.edit_tool_group = QButtonGroup(self)
+        self.edit_tool_group.setExclusive(True)
+        self.edit_tools = list(LABELS['edit_tools'])
+        for tool_id, tool in enumerate(self.edit_tools):
+            button = QPushButton(LABELS['edit_tools'][tool])
+            button.setCheckable(True)
+            button.setChecked(tool == 'view')
+            button.setStyleSheet(tool_button_style)
+            button.setCursor(Qt.CursorShape.PointingHandCursor)
+            self.edit_tool_group.addButton(button, tool_id)
+            tools_layout.addWidget(button)
+        self.edit_tool_group.idClicked.connect(lambda tool_id: self.edit_tool_changed.emit(self.edit_tools[tool_id]))
+        edit_layout.addLayout(tools_layout)
+
+        # 画笔半径与要写入的标签值（切换标签时同步为当前标签）
+        values_layout = QHBoxLayout()
+        values_layout.setSpacing(6)
+        radius_label = QLabel(LABELS['brush_radius'])
+        radius_label.setStyleSheet(value_style)
+        values_layout.addWidget(radius_label)
+        self.brush_radius = QSpinBox()
+        self.brush_radius.setRange(0, EDIT_CONFIG['max_brush_radius'])
+        self.brush_radius.setValue(EDIT_CONFIG['brush_radius'])
+        self.brush_radius.setStyleSheet(spin_style)
+        values_layout.addWidget(self.brush_radius)
+        value_label = QLabel(LABELS['edit_value'])
+        value_label.setStyleSheet(value_style)
+        values_layout.addWidget(value_label)
+        self.edit_value = QSpinBox()
+        self.edit_value.setRange(0, 65535)
+        self.edit_value.setStyleSheet(spin_style)
+        values_layout.addWidget(self.edit_value)
+        edit_layout.addLayout(values_layout)
+
+        history_layout = QHBoxLayout()
+        history_layout.setSpacing(6)
+        self.undo_button = QPushButton(LABELS['undo'])
+        self.undo_button.clicked.connect(self.undo_clicked.emit)
+        self.redo_button = QPushButton(LABELS['redo'])
+        self.redo_button.clicked.connect(self.redo_clicked.emit)
+        self.relabel_button = QPushButton(LABELS['relabel'])
+        self.relabel_button.setToolTip(LABELS['relabel_hint'])
+        self.relabel_button.clicked.connect(lambda: self.relabel_clicked.emit(self.edit_value.value()))
+        for button in (self.undo_button, self.redo_button, self.relabel_button):
+            button.setStyleSheet(tool_button_style)
+            button.setCursor(Qt.CursorShape.PointingHandCursor)
+            history_layout.addWidget(button)
+        edit_layout.addLayout(history_layout)
+        self.set_undo_state(False, False)
+
+        # 保存到原文件或另存为（.nii.gz 或不压缩的 .nii）
+        self.save_button = QPushButton(LABELS['save_labels'])
+        self.save_button.setStyleSheet(button_style)
+        self.save_button.clicked.connect(self.save_clicked.emit)
+        self.save_button.setCursor(Qt.CursorShape.PointingHandCursor)
+        edit_layout.addWidget(self.save_button)
+
+        self.content_layout.addWidget(edit_frame)
+
+        # 影像底图与窗宽窗位
+        intensity_frame = QFrame()
+        intensity_frame.setFrameStyle(QFrame.Shape.NoFrame)
+        intensity_frame.setStyleSheet(frame_style)
+        intensity_layout = QVBoxLayout(intensity_frame)
+        intensity_layout.setContentsMargins(12, 12, 12, 12)
+        intensity_layout.setSpacing(8)
+
+        intensity_title_layout = QHBoxLayout()
+        intensity_title_layout.setSpacing(8)
+        intensity_icon = QLabel("🖼️")
+        intensity_icon.setStyleSheet(f"""
+            font-size: {UI_CONFIG['title_font_size'] + 2}pt;
+            color: rgba(255, 255, 255, 240);
+        """)
+        intensity_title_layout.addWidget(intensity_icon)
+        intensity_title = QLabel(LABELS['intensity'])
+        intensity_title.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
+        intensity_title.setStyleSheet(f"""
+            color: rgba(255, 255, 255, 240);
+            font-weight: bold;
+            font-size: {UI_CONFIG['title_font_size']}pt;
+        """)
+        intensity_title_layout.addWidget(intensity_title)
+        intensity_title_layout.addStretch()
+        intensity_layout.addLayout(intensity_title_layout)
+
+        self.intensity_button = QPushButton(LABELS['load_intensity'])
+        self.intensity_button.setStyleSheet(button_style)
+        self.intensity_button.setToolTip(LABELS['intensity_hint'])
+        self.intensity_button.clicked.connect(self.intensity_selected.emit)
+        self.intensity_button.setCursor(Qt.CursorShape.PointingHandCursor)
+        intensity_layout.addWidget(self.intensity_button)
+
+        # 窗宽窗位控件，只在加载影像后显示
+        self.window_widget = QWidget()
+        window_layout = QVBoxLayout(self.window_widget)
+        window_layout.setContentsMargins(0, 0, 0, 0)
+        window_layout.setSpacing(4)
+        slider_style = """
+            QSlider::groove:horizontal {
+                background: rgba(60, 60, 80, 180);
+                height: 6px;
+                border-radius: 3px;
+            }
+            QSlider::handle:horizontal {
+                background: rgba(70, 130, 180, 220);
+                width: 14px;
+                margin: -5px 0;
+                border-radius: 7px;
+                border: 1px solid rgba(255, 255, 255, 50);
+            }
+        """
+        self.window_label = QLabel("")
+        self.window_label.setStyleSheet(value_style)
+        window_layout.addWidget(self.window_label)
+        self.window_slider = QSlider(Qt.Orientation.Horizontal)
+        self.window_slider.setRange(1, 2 * self.WINDOW_STEPS)
+        self.window_slider.setStyleSheet(slider_style)
+        self.window_slider.valueChanged.connect(self._on_window_slider)
+        window_layout.addWidget(self.window_slider)
+
+        self.level_label = QLabel("")
+        self.level_label.setStyleSheet(value_style)
+        window_layout.addWidget(self.level_label)
+        self.level_slider = QSlider(Qt.Orientation.Horizontal)
+        self.level_slider.setRange(0, self.WINDOW_STEPS)
+        self.level_slider.setStyleSheet(slider_style)
+        self.level_slider.valueChanged.connect(self._on_window_slider)
+        window_layout.addWidget(self.level_slider)
+
+        self.reset_window_button = QPushButton(LABELS['reset_window'])
+        self.reset_window_button.setStyleSheet(button_style)
+        self.reset_window_button.clicked.connect(self.window_reset.emit)
+        self.reset_window_button.setCursor(Qt.CursorShape.PointingHandCursor)
+        window_layout.addWidget(self.reset_window_button)
+
+        self._value_range = (0.0, 1.0)
+        self.window_widget.setVisible(False)
+        intensity_layout.addWidget(self.window_widget)
+
+        self.content_layout.addWidget(intensity_frame)
+
+        # 标签统计表，可按任意列排序，点击行切换到该标签
+        stats_frame = QFrame()
+        stats_frame.setFrameStyle(QFrame.Shape.NoFrame)
+        stats_frame.setStyleSheet(frame_style)
+        stats_layout = QVBoxLayout(stats_frame)
+        stats_layout.setContentsMargins(12, 12, 12, 12)
+        stats_layout.setSpacing(8)
+
+        stats_title_layout = QHBoxLayout()
+        stats_title_layout.setSpacing(8)
+        stats_icon = QLabel("📊")
+        stats_icon.setStyleSheet(f"""
+            font-size: {UI_CONFIG['title_font_size'] + 2}pt;
+            color: rgba(255, 255, 255, 240);
+        """)
+        stats_title_layout.addWidget(stats_icon)
+        stats_title = QLabel(LABELS['statistics'])
+        stats_title.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
+        stats_title.setStyleSheet(f"""
+            color: rgba(255, 255, 255, 240);
+            font-weight: bold;
+            font-size: {UI_CONFIG['title_font_size']}pt;
+        """)
+        stats_title_layout.addWidget(stats_title)
+        stats_title_layout.addStretch()
+        stats_layout.addLayout(stats_title_layout)
+
+        self.stats_status = QLabel("")
+        self.stats_status.setStyleSheet(value_style)
+        self.stats_status.setVisible(False)
+        stats_layout.addWidget(self.stats_status)
+
+        self.stats_table = QTableWidget(0, len(LABELS['stats_columns']))
+        self.stats_table.setHorizontalHeaderLabels(LABELS['stats_columns'])
+        self.stats_table.verticalHeader().setVisible(False)
+        self.stats_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.stats_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.stats_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.stats_table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.stats_table.setSortingEnabled(True)
+        self.stats_table.sortByColumn(0, Qt.SortOrder.AscendingOrder)
+        self.stats_table.setMinimumHeight(140)
+        self.stats_table.setStyleSheet(f"""
+            QTableWidget {{
+                background-color: rgba(40, 40, 60, 180);
+                color: rgba(255, 255, 255, 230);
+                gridline-color: rgba(255, 255, 255, 30);
+                border: 1px solid rgba(255, 255, 255, 40);
+                border-radius: 6px;
+                font-size: {UI_CONFIG['font_size'] - 2}pt;
+                padding: 0px;
+                selection-background-color: rgba(70, 130, 180, 200);
+            }}
+            QHeaderView::section {{
+                background-color: rgba(60, 60, 80, 220);
+                color: rgba(255, 255, 255, 230);
+                border: none;
+                padding: 3px;
+                font-size: {UI_CONFIG['font_size'] - 2}pt;
+            }}
+        """)
+        self.stats_table.itemClicked.connect(self._on_stats_clicked)
+        stats_layout.addWidget(self.stats_table)
+
+        self.export_stats_button = QPushButton(LABELS['export_stats'])
+        self.export_stats_button.setStyleSheet(button_style)
+        self.export_stats_button.setEnabled(False)
+        self.export_stats_button.clicked.connect(self.stats_export.emit)
+        self.export_stats_button.setCursor(Qt.CursorShape.PointingHandCursor)
+        stats_layout.addWidget(self.export_stats_button)
+
+        self.content_layout.addWidget(stats_frame)
         
         # 描述部分
         desc_frame = QFrame()
@@ -559,14 +1209,120 @@ class ControlPanel(QFrame):
         if index >= 0:
             label = self.label_combo.itemData(index)
             if label is not None:
+                self.edit_value.setValue(label)
                 self.label_changed.emit(label)
 
+    def set_undo_state(self, can_undo: bool, can_redo: bool):
+        self.undo_button.setEnabled(can_undo)
+        self.redo_button.setEnabled(can_redo)
+
+    def set_intensity(self, volume):
+        """按影像的取值范围和当前窗宽窗位设置滑块；volume为None时隐藏控件"""
+        self.window_widget.setVisible(volume is not None)
+        if volume is None:
+            return
+        self._value_range = volume.value_range
+        self.set_window(volume.window, volume.level)
+
+    def set_window(self, window: float, level: float):
+        # 只同步滑块位置，不发出window_changed
+        lo, hi = self._value_range
+        span = max(hi - lo, 1e-6)
+        for slider, value in ((self.window_slider, window / span), (self.level_slider, (level - lo) / span)):
+            slider.blockSignals(True)
+            slider.setValue(round(value * self.WINDOW_STEPS))
+            slider.blockSignals(False)
+        self._show_window(window, level)
+
+    def _show_window(self, window: float, level: float):
+        self.window_label.setText(f"{LABELS['window']}: {window:.4g}")
+        self.level_label.setText(f"{LABELS['level']}: {level:.4g}")
+
+    def _on_window_slider(self, _value):
+        lo, hi = self._value_range
+        span = max(hi - lo, 1e-6)
+        window = self.window_slider.value() / self.WINDOW_STEPS * span
+        level = lo + self.level_slider.value() / self.WINDOW_STEPS * span
+        self._show_window(window, level)
+        self.window_changed.emit(window, level)
+
+    def update_statistics(self, stats):
+        """填充统计表；stats为None表示正在计算"""
+        self.stats_table.setSortingEnabled(False)
+        self.stats_table.setRowCount(0)
+        self.export_stats_button.setEnabled(stats is not None)
+        self.stats_status.setVisible(stats is None)
+        if stats is None:
+            self.stats_status.setText(LABELS['stats_pending'].format(0))
+            return
+        self.stats_table.setRowCount(len(stats))
+        for row, record in enumerate(stats.records()):
+            # 以数值写入DisplayRole，排序按数值而非字符串
+            values = (record['label'], record['voxels'],
+                      round(record['volume_mm3'] / 1000, 3), round(record['surface_mm2'] / 100, 2))
+            for column, value in enumerate(values):
+                item = QTableWidgetItem()
+                item.setData(Qt.ItemDataRole.DisplayRole, value)
+                item.setToolTip(
+                    f"centroid ({record['centroid_x']:.1f}, {record['centroid_y']:.1f}, "
+                    f"{record['centroid_z']:.1f})\n"
+                    f"bbox x {record['x0']}-{record['x1']}, y {record['y0']}-{record['y1']}, "
+                    f"z {record['z0']}-{record['z1']}")
+                self.stats_table.setItem(row, column, item)
+        self.stats_table.setSortingEnabled(True)
+
+    def show_statistics_progress(self, percent: int):
+        self.stats_status.setText(LABELS['stats_pending'].format(percent))
+
+    def _on_stats_clicked(self, item: QTableWidgetItem):
+        # 通过标签下拉框切换，沿用label_changed的处理流程
+        label = self.stats_table.item(item.row(), 0).data(Qt.ItemDataRole.DisplayRole)
+        index = self.label_combo.findData(label)
+        if index >= 0:
+            self.label_combo.setCurrentIndex(index)
+
     def update_file_button(self, filename: str):
         self.file_button.setText(LABELS['file_selected'].format(filename))
 
-    def update_labels(self, labels: list):
+    def update_recent(self, paths: list, current: str):
+        """刷新最近打开列表（最近使用的在前），并选中当前文件"""
+        self.recent_combo.blockSignals(True)
+        self.recent_combo.clear()
+        for path in paths:
+            self.recent_combo.addItem(os.path.basename(path), path)
+            self.recent_combo.setItemData(self.recent_combo.count() - 1, path,
+                                          Qt.ItemDataRole.ToolTipRole)
+        index = self.recent_combo.findData(current)
+        if index >= 0:
+            self.recent_combo.setCurrentIndex(index)
+        self.recent_combo.blockSignals(False)
+        self.recent_widget.setVisible(len(paths) > 1)
+
+    def _on_recent_activated(self, index: int):
+        path = self.recent_combo.itemData(index)
+        if path is not None:
+            self.recent_selected.emit(path)
+
+    def set_loading(self, loading: bool):
+        """切换后台加载状态：显示进度区域并禁用加载按钮"""
+        self.load_button.setEnabled(not loading)
+        self.cancel_button.setEnabled(True)
+        self.progress_bar.setValue(0)
+        self.progress_label.setText("")
+        self.progress_widget.setVisible(loading)
+
+    def show_load_progress(self, stage: str, done: int, total: int):
+        stage_text = LABELS['load_stages'].get(stage, stage)
+        if stage == 'decompress':
+            stage_text += f" {done / 1e6:.1f} / {total / 1e6:.1f} MB"
+        self.progress_label.setText(stage_text)
+        self.progress_bar.setValue(done * 100 // total if total else 0)
+
+    def update_labels(self, labels: list, selected=None):
         # 保存当前标签列表用于排序和刷新
         self.current_labels = labels if labels else []
+        # 重建列表时屏蔽信号，由调用方决定是否需要切换标签
+        self.label_combo.blockSignals(True)
         self.label_combo.clear()
         
         # 根据排序顺序排序标签
@@ -574,6 +1330,13 @@ class ControlPanel(QFrame):
         
         for label in sorted_labels:
             self.label_combo.addItem(str(label), label)
+
+        # 恢复之前选中的标签（例如重新排序或切换回最近打开的体数据时）
+        if selected is not None:
+            index = self.label_combo.findData(selected)
+            if index >= 0:
+                self.label_combo.setCurrentIndex(index)
+        self.label_combo.blockSignals(False)
         
         # 更新标签计数显示
         if len(self.current_labels) > 0:
@@ -590,18 +1353,8 @@ class ControlPanel(QFrame):
         
         # 如果有标签，则重新排序
         if hasattr(self, 'current_labels') and self.current_labels:
-            # 保存当前选中的标签
-            current_label = self.label_combo.currentData()
-            
-            # 更新标签列表（会根据self.sort_ascending重新排序）
-            self.update_labels(self.current_labels)
-            
-            # 如果之前有选中的标签，尝试恢复选中状态
-            if current_label is not None:
-                for i in range(self.label_combo.count()):
-                    if self.label_combo.itemData(i) == current_label:
-                        self.label_combo.setCurrentIndex(i)
-                        break
+            # 重新排序并保持当前选中的标签，不触发标签切换
+            self.update_labels(self.current_labels, selected=self.label_combo.currentData())
         
     def _refresh_labels(self):
         # 触发刷新事件
@@ -610,8 +1363,43 @@ class ControlPanel(QFrame):
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.data_manager = NiftiDataManager()
+        self.data_manager = None
         self.current_file = None
+        self.load_worker = None
+        # 数据相关模块在第一次加载时初始化，见 _init_data_backend
+        self.decompress_cache = None
+        self.session = None
+        self.render_scheduler = RenderScheduler(self._render_scheduled_view,
+                                                DISPLAY_CONFIG['render_interval_ms'], self)
+        # 每个视图最后一次绘制的 (标签, 切片, 是否预览, 窗宽窗位, 是否显示全部标签, 编辑版本)，用于跳过重复渲染
+        self._rendered_views = {}
+        # 显示全部标签时的调色板，只在标签集合、当前标签或底图变化时重建
+        self.show_all_labels = DISPLAY_CONFIG['show_all_labels']
+        self._palette = None
+        self._palette_key = None
+        # 每个视图最近的滑动方向，用于预取后续切片
+        self.prefetcher = SlicePrefetcher(DISPLAY_CONFIG['prefetch_slices'])
+        self._travel = {}
+        # 多个视图同时更新时用于并行准备像素的线程池，首次使用时创建
+        self._render_pool = None
+        # 拖动窗宽窗位时合并重绘请求，三个视图一起重绘
+        self.window_timer = QTimer(self)
+        self.window_timer.setSingleShot(True)
+        self.window_timer.setInterval(DISPLAY_CONFIG['render_interval_ms'])
+        self.window_timer.timeout.connect(self.update_all_views)
+        # 标签统计在后台计算，同一时间只运行一个
+        self.stats_worker = None
+        # 标签编辑：当前工具与笔画状态；绘制时合并重绘请求
+        self.edit_tool = 'view'
+        self._stroke_last = None
+        self._stroke_edited = False
+        self.edit_timer = QTimer(self)
+        self.edit_timer.setSingleShot(True)
+        self.edit_timer.setInterval(DISPLAY_CONFIG['render_interval_ms'])
+        self.edit_timer.timeout.connect(self.update_all_views)
+        # 配置了trace文件时记录各阶段耗时，退出时导出
+        tracer.configure(bool(PERF_CONFIG['trace_file']), PERF_CONFIG['max_events'])
+        self.perf_overlay = PERF_CONFIG['overlay']
         self.setup_ui()
         
         # 设置窗口图标
@@ -646,7 +1434,19 @@ class MainWindow(QMainWindow):
         self.control_panel = ControlPanel()
         self.control_panel.file_selected.connect(self.open_file)
         self.control_panel.load_clicked.connect(self.load_data)
+        self.control_panel.cancel_clicked.connect(self.cancel_load)
+        self.control_panel.recent_selected.connect(self.switch_volume)
         self.control_panel.label_changed.connect(self.update_label)
+        self.control_panel.all_labels_toggled.connect(self.set_show_all_labels)
+        self.control_panel.intensity_selected.connect(self.open_intensity)
+        self.control_panel.window_changed.connect(self.update_window)
+        self.control_panel.window_reset.connect(self.reset_window)
+        self.control_panel.stats_export.connect(self.export_statistics)
+        self.control_panel.edit_tool_changed.connect(self.set_edit_tool)
+        self.control_panel.undo_clicked.connect(self.undo_edit)
+        self.control_panel.redo_clicked.connect(self.redo_edit)
+        self.control_panel.relabel_clicked.connect(self.relabel_current)
+        self.control_panel.save_clicked.connect(self.save_labels)
         self.main_layout.addWidget(self.control_panel)
 
         # 创建视图布局
@@ -670,16 +1470,35 @@ class MainWindow(QMainWindow):
         for view in GRID_CONFIG['views']:
             slice_widget = SliceWidget(view)
             slice_widget.slice_changed.connect(self.update_slice)
-            view_layout.addWidget(slice_widget)
+            slice_widget.edit_stroke.connect(self._on_edit_stroke)
+            slice_widget.edit_finished.connect(self._on_edit_finished)
+            slice_widget.set_perf_overlay(self.perf_overlay)
+            # 三个视图等分宽度，不受画布创建先后影响
+            view_layout.addWidget(slice_widget, 1)
             self.views[view] = slice_widget
 
+        # 快捷键切换帧率叠加层
+        self.perf_shortcut = QShortcut(QKeySequence(PERF_CONFIG['overlay_shortcut']), self)
+        self.perf_shortcut.activated.connect(self.toggle_perf_overlay)
+        self.undo_shortcut = QShortcut(QKeySequence(EDIT_CONFIG['undo_shortcut']), self)
+        self.undo_shortcut.activated.connect(self.undo_edit)
+        self.redo_shortcut = QShortcut(QKeySequence(EDIT_CONFIG['redo_shortcut']), self)
+        self.redo_shortcut.activated.connect(self.redo_edit)
+        self.save_shortcut = QShortcut(QKeySequence(EDIT_CONFIG['save_shortcut']), self)
+        self.save_shortcut.activated.connect(self.save_labels)
+
+    def toggle_perf_overlay(self):
+        self.perf_overlay = not self.perf_overlay
+        for slice_widget in self.views.values():
+            slice_widget.set_perf_overlay(self.perf_overlay)
+
     def open_file(self):
         try:
             file_path, _ = QFileDialog.getOpenFileName(
                 self,
                 LABELS['select_file'],
                 FILE_CONFIG['initial_dir'],
-                "NIfTI files (*.nii.gz)"
+                ";;".join(f"{name} ({pattern})" for name, pattern in FILE_CONFIG['file_types'])
             )
             if file_path:
                 self.current_file = file_path
@@ -691,21 +1510,408 @@ class MainWindow(QMainWindow):
         if not self.current_file:
             QMessageBox.warning(self, "Warning", ERROR_MESSAGES['no_file'])
             return
+        if self.load_worker is not None:
+            return
+        self._init_data_backend()
+
+        # 最近打开过的体数据仍在内存中，直接切换
+        if self.current_file in self.session:
+            self.switch_volume(self.current_file)
+            return
+
+        # 在工作线程中加载，完成后才替换当前数据并刷新视图
+        self._start_worker(VolumeLoadWorker(self.current_file, self.decompress_cache, self),
+                           self._on_volume_loaded)
+
+    def _start_worker(self, worker: VolumeLoadWorker, on_loaded):
+        # 标签和影像共用加载进度区域，同一时间只运行一个加载线程
+        self.load_worker = worker
+        worker.progress.connect(self.control_panel.show_load_progress)
+        worker.loaded.connect(on_loaded)
+        worker.failed.connect(self._on_load_failed)
+        worker.cancelled.connect(self._on_load_cancelled)
+        worker.finished.connect(self._on_load_finished)
+        self.control_panel.set_loading(True)
+        worker.start()
 
+    def open_intensity(self):
+        """选择与当前标签配对的影像文件，在后台读取"""
+        if self.data_manager is None:
+            QMessageBox.warning(self, "Warning", ERROR_MESSAGES['no_data'])
+            return
+        if self.load_worker is not None:
+            return
+        start_dir = os.path.dirname(self.current_file) if self.current_file else FILE_CONFIG['initial_dir']
+        file_path, _ = QFileDialog.getOpenFileName(
+            self,
+            LABELS['load_intensity'],
+            start_dir,
+            ";;".join(f"{name} ({pattern})" for name, pattern in FILE_CONFIG['file_types'])
+        )
+        if file_path:
+            self._start_worker(IntensityLoadWorker(file_path, parent=self), self._on_intensity_loaded)
+
+    def _on_intensity_loaded(self, file_path: str, volume: 'IntensityVolume'):
         try:
-            if self.data_manager.load_file(self.current_file):
-                # Convert labels to integers and sort them
-                labels = sorted([int(label) for label in self.data_manager.unique_labels])
-                self.control_panel.update_labels(labels)
-                self.update_all_views()
+            # 尺寸与标签不一致时拒绝配对
+            self.data_manager.set_intensity(volume)
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
+        self.control_panel.set_intensity(volume)
+        self.update_all_views()
+
+    def update_window(self, window: float, level: float):
+        if self.data_manager is None or self.data_manager.intensity is None:
+            return
+        # 只重建查找表；各视图在定时器到期时一起重绘
+        self.data_manager.intensity.set_window(window, level)
+        if not self.window_timer.isActive():
+            self.window_timer.start()
+
+    def reset_window(self):
+        if self.data_manager is None or self.data_manager.intensity is None:
+            return
+        intensity = self.data_manager.intensity
+        intensity.reset_window()
+        self.control_panel.set_window(intensity.window, intensity.level)
+        self.update_all_views()
+
+    def set_show_all_labels(self, show: bool):
+        self.show_all_labels = show
+        if self.data_manager is not None and self.data_manager._data_cache is not None:
+            self.update_all_views()
+
+    def _label_palette(self) -> 'np.ndarray':
+        # 每个标签的RGBA颜色预先算好，切片着色只需一次查表，与标签数量无关
+        manager = self.data_manager
+        overlay = manager.intensity is not None
+        key = (manager.label_index, manager.current_label, overlay)
+        if self._palette is None or self._palette_key != key:
+            from render_utils import build_label_palette
+            colors = DISPLAY_CONFIG['overlay_label_colors' if overlay else 'label_colors']
+            alpha = DISPLAY_CONFIG['overlay_all_labels_alpha' if overlay else 'all_labels_alpha']
+            self._palette = build_label_palette(manager.label_index.labels, manager.current_label,
+                                                colors[0], colors[2], alpha)
+            self._palette_key = key
+        return self._palette
+
+    def set_edit_tool(self, tool: str):
+        self.edit_tool = tool
+        for slice_widget in self.views.values():
+            slice_widget.set_editing(tool != 'view')
+
+    def _can_edit(self) -> bool:
+        # 保存期间不允许编辑，保证写出的文件对应同一版本
+        return (self.data_manager is not None and self.data_manager._data_cache is not None
+                and not isinstance(self.load_worker, LabelSaveWorker))
+
+    def _on_edit_stroke(self, view: str, row: int, col: int, first: bool):
+        if not self._can_edit() or self.edit_tool == 'view':
+            return
+        if first or self._stroke_last is None:
+            self._stroke_edited = False
+            centers = [(row, col)]
+        else:
+            # 鼠标移动较快时在两点间插值，笔画保持连续
+            last_row, last_col = self._stroke_last
+            radius = self.control_panel.brush_radius.value()
+            steps = max(1, int(max(abs(row - last_row), abs(col - last_col)) / max(1, radius)))
+            centers = [(round(last_row + (row - last_row) * k / steps),
+                        round(last_col + (col - last_col) * k / steps)) for k in range(1, steps + 1)]
+        self._stroke_last = (row, col)
+        value = 0 if self.edit_tool == 'eraser' else self.control_panel.edit_value.value()
+        manager = self.data_manager
+        try:
+            # 同一笔画合并为一次撤销
+            changed = manager.paint(view, manager.current_slices[view], centers,
+                                    self.control_panel.brush_radius.value(), value,
+                                    merge=self._stroke_edited)
+        except ValueError as e:
+            self._stroke_last = None
+            QMessageBox.warning(self, "Warning", str(e))
+            return
+        if changed:
+            self._stroke_edited = True
+            self._after_edit(final=False)
+
+    def _on_edit_finished(self):
+        self._stroke_last = None
+        if self._stroke_edited:
+            self._stroke_edited = False
+            self._after_edit()
+
+    def undo_edit(self):
+        if self._can_edit() and self.data_manager.undo():
+            self._after_edit()
+
+    def redo_edit(self):
+        if self._can_edit() and self.data_manager.redo():
+            self._after_edit()
+
+    def relabel_current(self, new_label: int):
+        if not self._can_edit():
+            return
+        manager = self.data_manager
+        if new_label == manager.current_label:
+            return
+        try:
+            changed = manager.relabel(manager.current_label, new_label)
+        except ValueError as e:
+            QMessageBox.warning(self, "Warning", str(e))
+            return
+        if changed:
+            self._after_edit(select=new_label if new_label > 0 else None)
+
+    def _after_edit(self, final: bool = True, select: Optional[int] = None):
+        """编辑、撤销或重做之后同步标签列表、统计表和撤销按钮，并合并重绘请求"""
+        manager = self.data_manager
+        labels = [int(label) for label in manager.unique_labels]
+        if labels != list(self.control_panel.current_labels) or select is not None:
+            # 新增、擦除或合并了标签
+            selected = select if select is not None else manager.current_label
+            self.control_panel.update_labels(labels, selected=selected)
+            label = self.control_panel.label_combo.currentData()
+            if label is not None and label != manager.current_label:
+                self.control_panel.edit_value.setValue(label)
+                manager.set_current_label(label)
+        self.control_panel.set_undo_state(manager.journal.can_undo, manager.journal.can_redo)
+        if final:
+            # 统计已随编辑增量更新；仍在计算时结束后会重新开始
+            if manager.label_stats is not None:
+                self.control_panel.update_statistics(manager.label_stats)
             else:
-                QMessageBox.critical(self, "Error", ERROR_MESSAGES['load_failed'])
+                self._request_statistics()
+        if not self.edit_timer.isActive():
+            self.edit_timer.start()
+
+    def save_labels(self):
+        """选择保存位置（默认为当前文件），在后台写入；扩展名决定是否压缩"""
+        if self.data_manager is None:
+            QMessageBox.warning(self, "Warning", ERROR_MESSAGES['no_data'])
+            return
+        if self.load_worker is not None:
+            return
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self,
+            LABELS['save_labels'],
+            self.current_file or FILE_CONFIG['initial_dir'],
+            ";;".join(f"{name} ({pattern})" for name, pattern in FILE_CONFIG['save_file_types'])
+        )
+        if not file_path:
+            return
+        if not file_path.endswith(('.nii', '.nii.gz')):
+            file_path += '.nii.gz' if '.gz' in selected_filter else '.nii'
+        self._start_worker(LabelSaveWorker(file_path, self.data_manager, self), self._on_labels_saved)
+
+    def _on_labels_saved(self, file_path: str, manager: 'NiftiDataManager'):
+        # 会话按文件修改时间判断是否过期；另存为后该体数据对应新文件
+        self.session.add(file_path, manager)
+        if manager is self.data_manager:
+            self.current_file = file_path
+            self.control_panel.update_file_button(os.path.basename(file_path))
+        self.control_panel.update_recent(self.session.paths(), os.path.abspath(self.current_file))
+
+    def _init_data_backend(self):
+        if self.session is not None:
+            return
+        from volume_session import VolumeSession
+        from nifti_cache import DecompressCache
+        if FILE_CONFIG['cache_enabled']:
+            self.decompress_cache = DecompressCache(FILE_CONFIG['cache_dir'],
+                                                    FILE_CONFIG['cache_max_mb'] * 1024 * 1024)
+        self.session = VolumeSession(FILE_CONFIG['session_memory_mb'] * 1024 * 1024)
+
+    def cancel_load(self):
+        if self.load_worker is not None:
+            self.load_worker.cancel()
+            self.control_panel.cancel_button.setEnabled(False)
+
+    def _on_volume_loaded(self, file_path: str, manager: 'NiftiDataManager'):
+        try:
+            self.session.add(file_path, manager)
+            self._activate_volume(file_path, manager)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to load data: {str(e)}")
 
+    def switch_volume(self, file_path: str):
+        """切换到会话中已加载的体数据；若已被释放则重新加载"""
+        manager = self.session.get(file_path)
+        self.current_file = file_path
+        self.control_panel.update_file_button(os.path.basename(file_path))
+        if manager is not None and manager.modified and self.session.changed_on_disk(file_path):
+            # 有未保存编辑的体数据不会被自动丢弃，由用户决定是否重新加载
+            reply = QMessageBox.question(
+                self, LABELS['unsaved_title'],
+                LABELS['changed_on_disk'].format(os.path.basename(file_path)),
+                QMessageBox.StandardButton.Discard | QMessageBox.StandardButton.Cancel,
+                QMessageBox.StandardButton.Cancel)
+            if reply == QMessageBox.StandardButton.Discard:
+                self.session.discard(file_path)
+                manager = None
+        if manager is None:
+            self.load_data()
+            return
+        try:
+            self._activate_volume(file_path, manager)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to load data: {str(e)}")
+
+    def _activate_volume(self, file_path: str, manager: 'NiftiDataManager'):
+        from label_index import VIEW_AXES
+        self.data_manager = manager
+        self.render_scheduler.cancel()
+        self.prefetcher.cancel()
+        self._travel.clear()
+        for view, axis in VIEW_AXES.items():
+            self.views[view.title()].set_slice_count(manager.shape[axis])
+        # Convert labels to integers and sort them
+        labels = sorted([int(label) for label in self.data_manager.unique_labels])
+        # 恢复上次查看的标签；新加载的体数据则选中列表中的第一个标签
+        self.control_panel.update_labels(labels, selected=manager.current_label)
+        self.control_panel.set_intensity(manager.intensity)
+        self.control_panel.set_undo_state(manager.journal.can_undo, manager.journal.can_redo)
+        label = self.control_panel.label_combo.currentData()
+        if label is not None:
+            manager.set_current_label(label)
+            # update_labels屏蔽了信号，画笔的标签值需要单独同步
+            self.control_panel.edit_value.setValue(label)
+        self._rendered_views.clear()
+        self.update_all_views()
+        self.control_panel.update_recent(self.session.paths(), os.path.abspath(file_path))
+        self._request_statistics()
+
+    def _request_statistics(self):
+        manager = self.data_manager
+        if manager.label_stats is not None:
+            self.control_panel.update_statistics(manager.label_stats)
+            return
+        self.control_panel.update_statistics(None)
+        # 正在为其他体数据计算时，等它结束后再开始
+        if self.stats_worker is not None:
+            return
+        self.stats_worker = StatisticsWorker(manager, self)
+        self.stats_worker.progress.connect(self._on_statistics_progress)
+        self.stats_worker.computed.connect(self._on_statistics_computed)
+        self.stats_worker.finished.connect(self._on_statistics_finished)
+        self.stats_worker.start()
+
+    def _on_statistics_progress(self, percent: int):
+        if self.stats_worker is not None and self.stats_worker.manager is self.data_manager:
+            self.control_panel.show_statistics_progress(percent)
+
+    def _on_statistics_computed(self, manager: 'NiftiDataManager', stats: 'LabelStatistics'):
+        # 只显示已保存的结果；计算期间发生编辑的结果已过期
+        if manager is self.data_manager and stats is manager.label_stats:
+            self.control_panel.update_statistics(stats)
+
+    def _on_statistics_finished(self):
+        finished_for = self.stats_worker.manager
+        finished_version = self.stats_worker.version
+        self.stats_worker.deleteLater()
+        self.stats_worker = None
+        if (self.data_manager is not None and self.data_manager.label_stats is None
+                and (self.data_manager is not finished_for
+                     or self.data_manager.edit_version != finished_version)):
+            self._request_statistics()
+
+    def export_statistics(self):
+        """将标签统计导出为CSV或JSON（按扩展名）"""
+        if self.data_manager is None or self.data_manager.label_stats is None:
+            return
+        base = os.path.basename(self.current_file or 'labels').split('.')[0]
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            LABELS['export_stats'],
+            os.path.join(os.path.dirname(self.current_file or ''), f"{base}_stats.csv"),
+            "CSV (*.csv);;JSON (*.json)"
+        )
+        if not file_path:
+            return
+        try:
+            self.data_manager.label_stats.export(file_path)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Failed to export statistics: {str(e)}")
+
+    def _on_load_failed(self, message: str):
+        QMessageBox.critical(self, "Error", message)
+
+    def _on_load_cancelled(self):
+        print(ERROR_MESSAGES['load_cancelled'])
+
+    def _on_load_finished(self):
+        self.control_panel.set_loading(False)
+        self.load_worker.deleteLater()
+        self.load_worker = None
+
+    def _confirm_unsaved(self) -> bool:
+        """有未保存的编辑时询问保存、放弃或取消；返回False表示取消关闭"""
+        unsaved = self.session.modified() if self.session is not None else []
+        if not unsaved:
+            return True
+        names = ", ".join(os.path.basename(path) for path, _ in unsaved)
+        reply = QMessageBox.question(
+            self, LABELS['unsaved_title'], LABELS['unsaved_close'].format(names),
+            QMessageBox.StandardButton.Save | QMessageBox.StandardButton.Discard
+            | QMessageBox.StandardButton.Cancel,
+            QMessageBox.StandardButton.Save)
+        if reply == QMessageBox.StandardButton.Cancel:
+            return False
+        if reply == QMessageBox.StandardButton.Save:
+            # 退出前直接写回原文件，失败时保留窗口
+            for path, manager in unsaved:
+                try:
+                    manager.save_file(path, FILE_CONFIG['save_compress_level'],
+                                      FILE_CONFIG['save_threads'])
+                except Exception as e:
+                    QMessageBox.critical(self, "Error", f"Failed to save labels: {str(e)}")
+                    return False
+        return True
+
+    def closeEvent(self, event):
+        # 正在保存时先等待写完，再询问其余未保存的编辑
+        if isinstance(self.load_worker, LabelSaveWorker):
+            self.load_worker.wait()
+        if not self._confirm_unsaved():
+            event.ignore()
+            return
+        # 退出前停止仍在运行的加载线程
+        if self.load_worker is not None:
+            self.load_worker.cancel()
+            self.load_worker.wait()
+        if self.stats_worker is not None:
+            self.stats_worker.cancel()
+            self.stats_worker.wait()
+        # 渲染线程池关闭后不能再有合并的编辑重绘
+        self.edit_timer.stop()
+        self.render_scheduler.cancel()
+        self.prefetcher.shutdown()
+        if self._render_pool is not None:
+            self._render_pool.shutdown(wait=False)
+        if PERF_CONFIG['trace_file']:
+            self.export_trace(PERF_CONFIG['trace_file'])
+        super().closeEvent(event)
+
+    def export_trace(self, path: str):
+        """导出Chrome trace JSON，并打印各阶段耗时汇总"""
+        try:
+            tracer.export_chrome_trace(path)
+        except OSError as e:
+            print(f"Error writing trace: {e}")
+            return
+        print(f"Trace written to {path}")
+        stats = sorted(tracer.summary().items(), key=lambda item: -item[1]['total_ms'])
+        for name, entry in stats:
+            print(f"  {name:<28} {entry['count']:>7}  total {entry['total_ms']:>10.1f} ms"
+                  f"  max {entry['max_ms']:>8.2f} ms")
+
     def update_label(self, label: int):
         try:
-            self.data_manager.set_current_label(label)
+            if self.data_manager is None or self.data_manager._data_cache is None:
+                return
+            # 重新选择同一标签时不做任何计算和重绘
+            if not self.data_manager.set_current_label(label):
+                return
             self.update_all_views()
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to update label: {str(e)}")
@@ -716,27 +1922,30 @@ class MainWindow(QMainWindow):
                 QMessageBox.warning(self, "Warning", ERROR_MESSAGES['no_data'])
                 return
 
+            # 记录最新位置和滑动方向，渲染交给调度器合并执行
+            previous = self.data_manager.current_slices[view]
+            if int(value) != previous:
+                self._travel[view] = int(value) - previous
             self.data_manager.current_slices[view] = int(value)
-            self.update_view(view)
+            self.render_scheduler.request(view)
         except Exception as e:
             print(f"Error updating slice: {e}")
             QMessageBox.critical(self, "Error", f"Failed to update slice: {str(e)}")
 
-    def update_view(self, view: str):
+    def _render_scheduled_view(self, view: str):
+        preview = DISPLAY_CONFIG['drag_preview'] and self.views[view.title()].is_dragging()
+        self.update_view(view, preview)
+        # 当前帧画完后再预取，避免与渲染争抢
+        self.prefetcher.request(self.data_manager, view, self.data_manager.current_slices[view],
+                                self._travel.get(view, 0), self.show_all_labels)
+
+    def update_view(self, view: str, preview: bool = False):
         try:
             if not hasattr(self.data_manager, '_data_cache') or self.data_manager._data_cache is None:
                 QMessageBox.warning(self, "Warning", ERROR_MESSAGES['no_data'])
                 return
 
-            slice_data, mask = self.data_manager.get_slice_data(
-                view,
-                self.data_manager.current_slices[view]
-            )
-            self.views[view.title()].update_view(
-                slice_data,
-                mask,
-                self.data_manager.current_slices[view]
-            )
+            self._render_views([view], preview)
         except Exception as e:
             print(f"Error updating view: {e}")
             QMessageBox.critical(self, "Error", f"Failed to update view: {str(e)}")
@@ -747,18 +1956,71 @@ class MainWindow(QMainWindow):
                 QMessageBox.warning(self, "Warning", ERROR_MESSAGES['no_data'])
                 return
 
-            for view in [v.lower() for v in GRID_CONFIG['views']]:
-                try:
-                    self.update_view(view)
-                except Exception as e:
-                    print(f"Error updating {view} view: {e}")
-                    continue
+            self.render_scheduler.cancel()
+            self._render_views([v.lower() for v in GRID_CONFIG['views']])
         except Exception as e:
             print(f"Error updating all views: {e}")
             QMessageBox.critical(self, "Error", f"Failed to update all views: {str(e)}")
 
+    @tracer.traced('render_views')
+    def _render_views(self, views: list, preview: bool = False):
+        # 与上次绘制的标签、切片、质量、窗宽窗位、显示模式和编辑版本相同的视图跳过
+        intensity = self.data_manager.intensity
+        window_id = intensity.window_id if intensity is not None else None
+        if self.show_all_labels:
+            # 在GUI线程中准备好调色板，渲染线程只读取
+            self._label_palette()
+        pending = []
+        for view in views:
+            state = (self.data_manager.current_label, self.data_manager.current_slices[view], preview,
+                     window_id, self.show_all_labels, self.data_manager.edit_version)
+            if self._rendered_views.get(view) != state:
+                pending.append((view, state))
+        if not pending:
+            return
+
+        start = time.perf_counter()
+        for view, _ in pending:
+            self.views[view.title()].ensure_canvas()
+        # 多个视图时在线程池中并行准备像素（NumPy运算释放GIL），GUI线程等待结果
+        if len(pending) > 1 and DISPLAY_CONFIG['parallel_views']:
+            if self._render_pool is None:
+                self._render_pool = ThreadPoolExecutor(max_workers=len(GRID_CONFIG['views']),
+                                                       thread_name_prefix='render')
+            frames = list(self._render_pool.map(self._prepare_view, pending))
+        else:
+            frames = [self._prepare_view(item) for item in pending]
+        prepared_at = time.perf_counter()
+
+        # 只有创建图像和绘制留在GUI线程
+        for (view, state), prepared in zip(pending, frames):
+            shown_at = time.perf_counter()
+            self.views[view.title()].show_prepared(prepared, state[1])
+            self._rendered_views[view] = state
+            elapsed = (prepared_at - start) + (time.perf_counter() - shown_at)
+            self.views[view.title()].record_frame(elapsed)
+
+    def _prepare_view(self, item):
+        # 可能在渲染线程中运行：只读取数据并用NumPy生成缓冲区
+        view, (label, slice_idx, preview, _, all_labels, _) = item
+        with tracer.span('prepare_view', view=view, preview=preview):
+            if all_labels:
+                # 调色板索引切片与当前标签无关，切换标签时缓存仍然有效
+                display = self.data_manager.get_label_rows(view, slice_idx)
+                palette = self._palette
+            else:
+                display = self.data_manager.get_display_data(view, slice_idx)
+                palette = None
+            # 轮廓按 (标签, 视图, 切片) 缓存，回到看过的切片时无需重新计算
+            outline = None if preview else self.data_manager.get_outline(view, slice_idx)
+            # 影像切片按窗宽窗位缓存，调整窗宽窗位只需重新查表
+            base = self.data_manager.get_intensity_data(view, slice_idx)
+            return self.views[view.title()].canvas.prepare_slice(display, outline, base, palette)
+
 if __name__ == '__main__':
     try:
+        startup = StartupTimer(_STARTUP_T0)
+        startup.mark('imports')
         app = QApplication(sys.argv)
         
         # 设置应用程序图标
@@ -821,17 +2083,26 @@ if __name__ == '__main__':
             }
         """)
         
+        startup.mark('app')
+
         window = MainWindow()
+        startup.mark('window')
         
-        # 使用淡入效果显示窗口
+        # 使用淡入效果显示窗口；动画由事件循环驱动，不阻塞启动
         window.setWindowOpacity(0)
         window.show()
-        
-        # 动画效果淡入
-        for i in range(1, 11):
-            window.setWindowOpacity(i/10)
-            app.processEvents()
-            QTimer.singleShot(20, app.processEvents)
+        fade_in = QPropertyAnimation(window, b"windowOpacity", window)
+        fade_in.setDuration(UI_CONFIG['fade_in_ms'])
+        fade_in.setStartValue(0.0)
+        fade_in.setEndValue(1.0)
+        fade_in.start()
+
+        # 事件循环处理完首次绘制后记录并输出启动耗时
+        def report_startup():
+            startup.mark('first paint')
+            if UI_CONFIG['startup_timing']:
+                print(startup.report())
+        QTimer.singleShot(0, report_startup)
         
         sys.exit(app.exec())
     except Exception as e:
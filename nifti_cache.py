@@ -0,0 +1,138 @@
+import hashlib
+import io
+import os
+import tempfile
+import numpy as np
+import nibabel as nib
+from typing import Dict, Optional
+
+from perf_trace import tracer
+
+class DecompressCache:
+    """On-disk cache of decompressed ``.nii.gz`` label volumes.
+
+    Each entry is a raw ``.npy`` array that can be memory-mapped, plus the
+    NIfTI header block (with its extensions) and optional named ``.npz``
+    bundles of derived arrays (such as the label index). Entries are keyed
+    by source path, mtime and size, so a changed file simply misses. The
+    cache is bounded by ``max_bytes``; the least recently used entries are
+    evicted first.
+    """
+
+    # Part of every key; bump it when the entry layout changes
+    FORMAT_VERSION = 1
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _key(self, file_path: str) -> str:
+        stat = os.stat(file_path)
+        ident = (f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}"
+                 f"|{self.FORMAT_VERSION}")
+        return hashlib.sha1(ident.encode('utf-8')).hexdigest()
+
+    def _paths(self, key: str):
+        base = os.path.join(self.cache_dir, key)
+        return base + '.npy', base + '.hdr'
+
+    @tracer.traced('cache.load')
+    def load(self, file_path: str) -> Optional[nib.Nifti1Image]:
+        """Return the cached image (data memory-mapped) or None on a miss."""
+        data_path, header_path = self._paths(self._key(file_path))
+        if not (os.path.exists(data_path) and os.path.exists(header_path)):
+            return None
+        try:
+            with open(header_path, 'rb') as f:
+                header = nib.Nifti1Header.from_fileobj(io.BytesIO(f.read()))
+            data = np.load(data_path, mmap_mode='c')
+            # Touch the entry so eviction treats it as recently used
+            os.utime(data_path)
+        except (OSError, ValueError) as e:
+            print(f"Error reading decompress cache: {e}")
+            return None
+        return nib.Nifti1Image(data, header.get_best_affine(), header)
+
+    @tracer.traced('cache.store')
+    def store(self, file_path: str, image: nib.Nifti1Image, data: np.ndarray):
+        """Write the decompressed volume atomically, then enforce the size cap."""
+        if data.nbytes > self.max_bytes:
+            return
+        data_path, header_path = self._paths(self._key(file_path))
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Header first; a data file is only visible once fully written.
+            # write_to also writes the extensions, which from_fileobj reads back
+            self._write_atomic(header_path, image.header.copy().write_to)
+            self._write_atomic(data_path, lambda f: np.save(f, data))
+        except OSError as e:
+            print(f"Error writing decompress cache: {e}")
+            return
+        self._evict()
+
+    @tracer.traced('cache.load_arrays')
+    def load_arrays(self, file_path: str, name: str) -> Optional[Dict[str, np.ndarray]]:
+        """Return a derived array bundle stored next to a cached volume."""
+        path = self._bundle_path(self._key(file_path), name)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as bundle:
+                return {key: bundle[key] for key in bundle.files}
+        except (OSError, ValueError) as e:
+            print(f"Error reading decompress cache: {e}")
+            return None
+
+    @tracer.traced('cache.store_arrays')
+    def store_arrays(self, file_path: str, name: str, arrays: Dict[str, np.ndarray]):
+        """Attach a derived array bundle to an already cached volume."""
+        key = self._key(file_path)
+        if not os.path.exists(self._paths(key)[0]):
+            return
+        try:
+            self._write_atomic(self._bundle_path(key, name), lambda f: np.savez(f, **arrays))
+        except OSError as e:
+            print(f"Error writing decompress cache: {e}")
+
+    def _bundle_path(self, key: str, name: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.{name}.npz")
+
+    def _write_atomic(self, path: str, write):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _evict(self):
+        # Group every file of an entry under its key; recency is the data
+        # file's mtime, which load() refreshes on each hit
+        entries = {}
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.tmp'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            key = name.split('.', 1)[0]
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entry = entries.setdefault(key, {'mtime': 0.0, 'size': 0, 'paths': []})
+            entry['size'] += stat.st_size
+            entry['paths'].append(path)
+            if name.endswith('.npy'):
+                entry['mtime'] = stat.st_mtime
+
+        total = sum(entry['size'] for entry in entries.values())
+        for entry in sorted(entries.values(), key=lambda e: e['mtime']):
+            if total <= self.max_bytes:
+                break
+            for path in entry['paths']:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= entry['size']
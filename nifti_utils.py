@@ -1,29 +1,206 @@
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import threading
 import numpy as np
 import nibabel as nib
-from typing import Tuple, Dict, List, Optional
+from typing import Tuple, Dict, List, Optional, Callable
+
+from intensity_volume import IntensityVolume
+from label_edit import LabelEdit, EditJournal
+from label_index import VIEW_AXES, LabelIndex, label_row_lookup
+from label_stats import LabelStatistics
+from nifti_cache import DecompressCache
+from parallel_gzip import ParallelGzipWriter
+from perf_trace import tracer
+from progress import ProgressCallback, LoadCancelled, ProgressReader
+from render_utils import outline_mask
+from slice_cache import SliceCache
+from sparse_volume import BlockSparseVolume, label_dtype
+
+# Axis order of the precomputed display volume for each view: the slicing
+# axis comes first so every slice is one contiguous block
+DISPLAY_LAYOUTS = {'axial': (2, 0, 1), 'coronal': (1, 0, 2), 'sagittal': (0, 1, 2)}
 
 class NiftiDataManager:
-    def __init__(self):
+    # Volumes larger than this never get precomputed display volumes
+    DISPLAY_PRECOMPUTE_MAX_VOXELS = 1 << 26
+    # Budgets for cached outline masks and, without precomputed display
+    # volumes, display slices of visited and prefetched slices
+    OUTLINE_CACHE_BYTES = 32 << 20
+    DISPLAY_CACHE_BYTES = 64 << 20
+    # Edge length of the blocks of sparse label volumes
+    SPARSE_BLOCK_SIZE = 32
+    # Budget for the undo/redo journal of label edits
+    UNDO_MAX_BYTES = 256 << 20
+    # Uncompressed bytes per block written (and compressed) by save_file
+    SAVE_BLOCK_BYTES = 4 << 20
+
+    def __init__(self, cache: Optional[DecompressCache] = None, precompute_display: bool = False,
+                 sparse: bool = False):
+        self.cache = cache
+        self.precompute_display = precompute_display
+        self.sparse = sparse
         self.nii_data: Optional[nib.Nifti1Image] = None
         self.unique_labels: List[int] = []
         self.current_label: int = 0
         self.current_slices: Dict[str, int] = {'axial': 0, 'coronal': 0, 'sagittal': 0}
         self.shape: Optional[Tuple[int, int, int]] = None
+        # Dense ndarray/memmap, or a BlockSparseVolume when ``sparse`` is set
         self._data_cache: Optional[np.ndarray] = None
+        self.label_index: Optional[LabelIndex] = None
+        # Computed on first use by get_label_statistics
+        self.label_stats: Optional[LabelStatistics] = None
+        # uint8 0/1/2 display volumes per view, see _build_display_volumes
+        self._display_volumes: Optional[Dict[str, np.ndarray]] = None
+        self._display_label: Optional[int] = None
+        # Paired intensity image drawn under the labels, see set_intensity
+        self.intensity: Optional[IntensityVolume] = None
+        # Label edits since loading, see apply_edit
+        self.journal = EditJournal(self.UNDO_MAX_BYTES)
+        self.modified = False
+        # Incremented by every edit, undo and redo
+        self.edit_version = 0
+        self.outline_cache = SliceCache(self.OUTLINE_CACHE_BYTES)
+        self.display_cache = SliceCache(self.DISPLAY_CACHE_BYTES)
+        # Palette index slices for showing all labels, see get_label_rows
+        self.label_rows_cache = SliceCache(self.DISPLAY_CACHE_BYTES)
+        self._row_lookup: Optional[Callable[[np.ndarray], np.ndarray]] = None
+        # Held while the label changes and while the prefetch thread reads
+        # the display volumes, so a prefetched slice never mixes two labels
+        self._lock = threading.RLock()
 
-    def load_file(self, file_path: str) -> bool:
-        """Load NIfTI file and initialize data."""
+    @tracer.traced('load_file')
+    def load_file(self, file_path: str, progress: Optional[ProgressCallback] = None) -> bool:
+        """Load NIfTI file and initialize data; ``progress`` may raise LoadCancelled to abort."""
         try:
-            self.nii_data = nib.load(file_path)
+            self._display_volumes = None
+            self._display_label = None
+            self.intensity = None
+            self.label_stats = None
+            self.journal.clear()
+            self.modified = False
+            self.outline_cache.clear()
+            self.display_cache.clear()
+            self.label_rows_cache.clear()
+            compressed = file_path.endswith('.gz')
+            cached = None
+            if compressed and self.cache is not None and not self.sparse:
+                cached = self.cache.load(file_path)
+
+            if self.sparse:
+                self.nii_data, self._data_cache = self._load_sparse(file_path, progress)
+            elif cached is not None:
+                if progress is not None:
+                    progress('read', 0, 1)
+                self.nii_data = cached
+                self._data_cache = np.asanyarray(cached.dataobj)
+            elif progress is not None and compressed:
+                self.nii_data, self._data_cache = self._load_with_progress(file_path, progress)
+            else:
+                if progress is not None:
+                    progress('read', 0, 1)
+                # Uncompressed integer volumes come back as a copy-on-write
+                # memmap: slices are paged in on demand and edits stay private
+                self.nii_data = nib.load(file_path, mmap='c')
+                self._data_cache = self._read_label_array(self.nii_data)
+            if compressed and self.cache is not None and cached is None and not self.sparse:
+                if progress is not None:
+                    progress('cache', 0, 1)
+                self.cache.store(file_path, self.nii_data, self._data_cache)
+
             self.shape = self.nii_data.shape
-            self._data_cache = self.nii_data.get_fdata()
-            self.unique_labels = np.unique(self._data_cache)
-            self.unique_labels = self.unique_labels[self.unique_labels > 0]
+            self.label_index = None
+            if cached is not None:
+                index_arrays = self.cache.load_arrays(file_path, 'index')
+                if index_arrays is not None:
+                    self.label_index = LabelIndex.from_arrays(index_arrays)
+            if self.label_index is None:
+                self.label_index = LabelIndex.build(self._data_cache, progress)
+                if compressed and self.cache is not None and not self.sparse:
+                    self.cache.store_arrays(file_path, 'index', self.label_index.to_arrays())
+            self.unique_labels = self.label_index.labels
+            self._row_lookup = label_row_lookup(self.label_index.labels, first_row=1, missing=0)
             return True
+        except LoadCancelled:
+            raise
         except Exception as e:
             print(f"Error loading file: {e}")
             return False
 
+    @classmethod
+    @tracer.traced('decompress')
+    def _load_with_progress(cls, file_path: str,
+                            progress: ProgressCallback) -> Tuple[nib.Nifti1Image, np.ndarray]:
+        """Stream the file through gzip, reporting compressed bytes consumed."""
+        progress('read', 0, 1)
+        total = os.path.getsize(file_path)
+        with open(file_path, 'rb') as raw:
+            stream = gzip.GzipFile(fileobj=ProgressReader(raw, total, progress))
+            image = nib.Nifti1Image.from_stream(stream)
+            data = cls._read_label_array(image)
+        # Rebind to the in-memory array; the stream is closed now
+        return nib.Nifti1Image(data, image.affine, image.header), data
+
+    @classmethod
+    @tracer.traced('read_sparse')
+    def _load_sparse(cls, file_path: str, progress: Optional[ProgressCallback]
+                     ) -> Tuple[nib.Nifti1Image, BlockSparseVolume]:
+        """Stream the file into a BlockSparseVolume; the returned image is an unloaded proxy."""
+        if progress is not None:
+            progress('read', 0, 1)
+        if not file_path.endswith('.gz'):
+            image = nib.load(file_path)
+            return image, BlockSparseVolume.from_dataobj(image.dataobj, cls.SPARSE_BLOCK_SIZE, progress)
+        with open(file_path, 'rb') as raw:
+            stream = gzip.GzipFile(fileobj=raw)
+            streamed = nib.Nifti1Image.from_stream(stream)
+            data = BlockSparseVolume.from_dataobj(streamed.dataobj, cls.SPARSE_BLOCK_SIZE, progress)
+        return nib.load(file_path), data
+
+    @staticmethod
+    @tracer.traced('read_labels')
+    def _read_label_array(nii_data: nib.Nifti1Image) -> np.ndarray:
+        """Read the label volume in its compact on-disk integer dtype."""
+        data = np.asanyarray(nii_data.dataobj)
+        if np.issubdtype(data.dtype, np.integer):
+            return data
+
+        # Float storage (or non-trivial scaling): labels are still integers,
+        # so narrow to the smallest integer dtype that holds the value range
+        if not np.all(np.isfinite(data)):
+            raise ValueError("Label volume contains non-finite values")
+        rounded = np.rint(data)
+        if not np.array_equal(rounded, data):
+            print("Warning: non-integer label values were rounded")
+        if rounded.size == 0:
+            return rounded.astype(np.uint8)
+        return rounded.astype(label_dtype(int(rounded.min()), int(rounded.max())))
+
+    @property
+    def is_memory_mapped(self) -> bool:
+        """Whether the label volume is backed by a memmap of the source file."""
+        return isinstance(self._data_cache, np.memmap)
+
+    @property
+    def memory_bytes(self) -> int:
+        """Approximate private memory held; memory-mapped data is not counted."""
+        total = 0
+        if self._data_cache is not None and not self.is_memory_mapped:
+            total += self._data_cache.nbytes
+        if self.label_index is not None:
+            total += sum(arr.nbytes for arr in self.label_index.to_arrays().values())
+        if self._display_volumes is not None:
+            total += sum(vol.nbytes for vol in self._display_volumes.values())
+        if self.intensity is not None:
+            total += self.intensity.memory_bytes
+        total += self.journal.nbytes
+        return (total + self.outline_cache.nbytes + self.display_cache.nbytes
+                + self.label_rows_cache.nbytes)
+
+    @tracer.traced('get_slice_data')
     def get_slice_data(self, view: str, slice_idx: int) -> Tuple[np.ndarray, np.ndarray]:
         """Get slice data and mask for a specific view and slice index."""
         if self._data_cache is None:
@@ -43,63 +220,404 @@ class NiftiDataManager:
             else:
                 raise ValueError(f"Invalid view: {view}")
 
-            # Create mask and ensure data type consistency
-            mask = (slice_data == self.current_label).astype(np.float32)
-            slice_data = slice_data.astype(np.float32)
+            # Only this slice is read when the volume is memory-mapped or
+            # sparse; it stays in the integer label dtype and the mask is boolean
+            slice_data = np.asarray(slice_data)
+            mask = slice_data == self.current_label
 
             return slice_data, mask
         except Exception as e:
             print(f"Error getting slice data: {e}")
             raise
 
+    def get_label_statistics(self, progress: Optional[ProgressCallback] = None) -> LabelStatistics:
+        """Per-label statistics, kept unless the labels were edited during the pass."""
+        if self._data_cache is None:
+            raise ValueError("No data loaded")
+        if self.label_stats is not None:
+            return self.label_stats
+        version = self.edit_version
+        zooms = self.nii_data.header.get_zooms()[:3]
+        stats = LabelStatistics.compute(self._data_cache, self.label_index.labels,
+                                        zooms, self.nii_data.affine, progress)
+        with self._lock:
+            if self.edit_version == version:
+                self.label_stats = stats
+        return stats
+
+    @tracer.traced('get_optimal_slices')
     def get_optimal_slices(self) -> Dict[str, int]:
         """Calculate optimal slice indices for each view."""
         if self._data_cache is None:
             raise ValueError("No data loaded")
 
         try:
-            mask = (self._data_cache == self.current_label)
-            
-            optimal_slices = {
-                'axial': np.any(mask, axis=(0, 1)),
-                'coronal': np.any(mask, axis=(0, 2)),
-                'sagittal': np.any(mask, axis=(1, 2))
-            }
-
-            result = {}
-            for view in optimal_slices:
-                available = np.where(optimal_slices[view])[0]
-                if len(available) > 0:
-                    result[view] = available[len(available) // 2]
-                else:
-                    # Default to middle slice if no label found
-                    if view == 'axial':
-                        result[view] = self.shape[2] // 2
-                    elif view == 'coronal':
-                        result[view] = self.shape[1] // 2
-                    else:  # sagittal
-                        result[view] = self.shape[0] // 2
+            result = self.label_index.optimal_slices(self.current_label)
+            if result is None:
+                # Default to middle slice if no label found
+                result = {view: self.shape[axis] // 2 for view, axis in VIEW_AXES.items()}
 
             return result
         except Exception as e:
             print(f"Error calculating optimal slices: {e}")
             raise
 
-    def set_current_label(self, label: int):
-        """Set current label and update optimal slices."""
+    @tracer.traced('set_current_label')
+    def set_current_label(self, label: int) -> bool:
+        """Set current label and update optimal slices; False if it already was current."""
         try:
-            self.current_label = label
-            self.current_slices = self.get_optimal_slices()
+            if label == self.current_label and self.label_index is not None and label in self.label_index:
+                return False
+            with self._lock:
+                self.current_label = label
+                self.current_slices = self.get_optimal_slices()
+                if self.precompute_display:
+                    self._update_display_volumes()
+            return True
         except Exception as e:
             print(f"Error setting current label: {e}")
             raise
 
+    def _update_display_volumes(self):
+        if self._display_volumes is None:
+            # Dense display volumes would undo the savings of sparse storage
+            if self.sparse or self._data_cache.size > self.DISPLAY_PRECOMPUTE_MAX_VOXELS:
+                return
+            self._build_display_volumes()
+        elif self._display_label != self.current_label:
+            self._retarget_display_volumes(self._display_label, self.current_label)
+
+    @tracer.traced('display_volumes.build')
+    def _build_display_volumes(self):
+        """Build the 0/1/2 display volume once, in every view's layout."""
+        nx, ny, nz = self.shape
+        volumes = {view: np.empty(tuple(self.shape[axis] for axis in layout), dtype=np.uint8)
+                   for view, layout in DISPLAY_LAYOUTS.items()}
+        step = max(1, LabelIndex.SLAB_VOXELS // max(1, nx * ny))
+        for z0 in range(0, nz, step):
+            slab = np.asarray(self._data_cache[:, :, z0:z0 + step])
+            display = (slab > 0).view(np.uint8)
+            display[slab == self.current_label] = 2
+            for view, layout in DISPLAY_LAYOUTS.items():
+                region = [slice(None)] * 3
+                region[layout.index(2)] = slice(z0, z0 + slab.shape[2])
+                volumes[view][tuple(region)] = display.transpose(layout)
+        self._display_volumes = volumes
+        self._display_label = self.current_label
+
+    @tracer.traced('display_volumes.retarget')
+    def _retarget_display_volumes(self, old_label: Optional[int], new_label: int):
+        for label, value in ((old_label, 1), (new_label, 2)):
+            bbox = None if label is None else self.label_index.bbox(label)
+            if bbox is None:
+                continue
+            bounds = tuple(slice(lo, hi + 1) for lo, hi in bbox)
+            region = np.asarray(self._data_cache[bounds]) == label
+            for view, layout in DISPLAY_LAYOUTS.items():
+                target = self._display_volumes[view][tuple(bounds[axis] for axis in layout)]
+                target[region.transpose(layout)] = value
+        self._display_label = new_label
+
+    def _clamp_slice(self, view: str, slice_idx: int) -> int:
+        return min(max(0, slice_idx), self.shape[VIEW_AXES[view]] - 1)
+
+    @tracer.traced('get_display_data')
     def get_display_data(self, view: str, slice_idx: int) -> np.ndarray:
         """Get processed display data for a specific view and slice."""
         try:
-            slice_data, _ = self.get_slice_data(view, slice_idx)
-            return np.where(slice_data == self.current_label, 2,
-                          np.where(slice_data > 0, 1, 0))
+            slice_idx = self._clamp_slice(view, slice_idx)
+            if self._display_volumes is not None and self._display_label == self.current_label:
+                return self._display_volumes[view][slice_idx]
+            key = (self.current_label, view, slice_idx)
+            display = self.display_cache.get(key)
+            if display is None:
+                slice_data, mask = self.get_slice_data(view, slice_idx)
+                display = (slice_data > 0).astype(np.uint8)
+                display[mask] = 2
+                self.display_cache.put(key, display)
+            return display
         except Exception as e:
             print(f"Error getting display data: {e}")
-            raise 
\ No newline at end of file
+            raise
+
+    @tracer.traced('get_label_rows')
+    def get_label_rows(self, view: str, slice_idx: int) -> np.ndarray:
+        """Palette row of every pixel (0 background, ``i + 1`` for ``label_index.labels[i]``)."""
+        slice_idx = self._clamp_slice(view, slice_idx)
+        key = (view, slice_idx)
+        rows = self.label_rows_cache.get(key)
+        if rows is None:
+            slice_data, _ = self.get_slice_data(view, slice_idx)
+            dtype = np.uint16 if len(self.label_index) < np.iinfo(np.uint16).max else np.uint32
+            rows = self._row_lookup(slice_data).astype(dtype)
+            self.label_rows_cache.put(key, rows)
+        return rows
+
+    def paint(self, view: str, slice_idx: int, centers: List[Tuple[int, int]], radius: float,
+              value: int, merge: bool = False) -> int:
+        """Paint discs around (row, column) ``centers`` on one slice; returns voxels changed."""
+        axis = VIEW_AXES[view]
+        rows, cols = (n for a, n in enumerate(self.shape) if a != axis)
+        reach = int(radius)
+        di, dj = np.mgrid[-reach:reach + 1, -reach:reach + 1]
+        disc = di ** 2 + dj ** 2 <= radius ** 2
+        centers = np.asarray(centers, dtype=np.int64).reshape(-1, 2)
+        i = (centers[:, 0, None] + di[disc]).ravel()
+        j = (centers[:, 1, None] + dj[disc]).ravel()
+        inside = (i >= 0) & (i < rows) & (j >= 0) & (j < cols)
+        # Overlapping discs share voxels; each is written once
+        i, j = np.unravel_index(np.unique(np.ravel_multi_index((i[inside], j[inside]), (rows, cols))),
+                                (rows, cols))
+        coords = [i, j]
+        coords.insert(axis, np.full(len(i), self._clamp_slice(view, slice_idx)))
+        return self.apply_edit(tuple(coords), value, merge)
+
+    def relabel(self, label: int, new_label: int) -> int:
+        """Change every voxel of ``label`` to ``new_label``; 0 deletes the label."""
+        bbox = self.label_index.bbox(label)
+        if bbox is None:
+            return 0
+        bounds = tuple(slice(lo, hi + 1) for lo, hi in bbox)
+        found = np.nonzero(np.asarray(self._data_cache[bounds]) == label)
+        coords = tuple(c + lo for c, (lo, _) in zip(found, bbox))
+        return self.apply_edit(coords, new_label)
+
+    @tracer.traced('apply_edit')
+    def apply_edit(self, coords: Tuple[np.ndarray, np.ndarray, np.ndarray], values,
+                   merge: bool = False) -> int:
+        """Write label ``values`` at distinct voxel coordinates, journal and index the change."""
+        try:
+            with self._lock:
+                values = np.broadcast_to(np.asarray(values), coords[0].shape)
+                self._check_label_values(values)
+                old = np.asarray(self._data_cache[coords])
+                changed = old != values
+                if not changed.any():
+                    return 0
+                coords = tuple(c[changed] for c in coords)
+                old = old[changed]
+                self._write_labels(coords, values[changed])
+                new = values[changed].astype(self._data_cache.dtype)
+                self.journal.record(LabelEdit(np.ravel_multi_index(coords, self.shape), old, new),
+                                    merge)
+                self._labels_changed(coords, old, new)
+                return len(old)
+        except Exception as e:
+            print(f"Error applying edit: {e}")
+            raise
+
+    def undo(self) -> bool:
+        """Revert the most recent edit; False when there is none."""
+        with self._lock:
+            edit = self.journal.pop_undo()
+            if edit is None:
+                return False
+            coords = np.unravel_index(edit.index, self.shape)
+            self._write_labels(coords, edit.old)
+            self._labels_changed(coords, edit.new, edit.old)
+            return True
+
+    def redo(self) -> bool:
+        """Reapply the most recently undone edit; False when there is none."""
+        with self._lock:
+            edit = self.journal.pop_redo()
+            if edit is None:
+                return False
+            coords = np.unravel_index(edit.index, self.shape)
+            self._write_labels(coords, edit.new)
+            self._labels_changed(coords, edit.old, edit.new)
+            return True
+
+    def _check_label_values(self, values: np.ndarray):
+        if not values.size:
+            return
+        lo, hi = int(values.min()), int(values.max())
+        if lo < 0:
+            raise ValueError(f"Labels must not be negative: {lo}")
+        # Edits have to remain writable in the file's own data type
+        dtype = self._storage_dtype()
+        if dtype is not None and hi > np.iinfo(dtype).max:
+            raise ValueError(f"Label {hi} does not fit the file's {dtype} data type")
+
+    def _storage_dtype(self) -> Optional[np.dtype]:
+        """On-disk integer dtype holding the labels unscaled; None for float or scaled files."""
+        dtype = self.nii_data.get_data_dtype()
+        # nibabel moves the scaling from the image header to the array proxy
+        dataobj = self.nii_data.dataobj
+        if (not np.issubdtype(dtype, np.integer) or getattr(dataobj, 'slope', 1) != 1
+                or getattr(dataobj, 'inter', 0) != 0):
+            return None
+        return dtype
+
+    def _write_labels(self, coords: Tuple[np.ndarray, ...], values: np.ndarray):
+        data = self._data_cache
+        if not self.sparse and len(values):
+            dtype = label_dtype(int(values.min()), int(values.max()), data.dtype)
+            if dtype != data.dtype or not data.flags.writeable:
+                # Read-only arrays, or ones too narrow for the new label, are copied once
+                data = self._data_cache = data.astype(dtype)
+        data[coords] = values
+
+    def _labels_changed(self, coords: Tuple[np.ndarray, ...], old: np.ndarray, new: np.ndarray):
+        """Bring the index, statistics and cached slices up to date after a write."""
+        self.label_index = self.label_index.apply_edit(coords, old, new, self._data_cache)
+        if self.label_stats is not None:
+            self.label_stats = self.label_stats.apply_edit(self.label_index, coords, old, new,
+                                                           self._data_cache)
+        if not np.array_equal(self.unique_labels, self.label_index.labels):
+            self.unique_labels = self.label_index.labels
+            # Palette indices follow the label list
+            self._row_lookup = label_row_lookup(self.label_index.labels, first_row=1, missing=0)
+            self.label_rows_cache.clear()
+        if self._display_volumes is not None:
+            display = (new > 0).view(np.uint8)
+            display[new == self._display_label] = 2
+            for view, layout in DISPLAY_LAYOUTS.items():
+                self._display_volumes[view][tuple(coords[axis] for axis in layout)] = display
+        touched = {view: set(np.unique(coords[axis]).tolist()) for view, axis in VIEW_AXES.items()}
+        for cache in (self.outline_cache, self.display_cache, self.label_rows_cache):
+            # Keys end with (view, slice)
+            cache.discard(lambda key: key[-1] in touched[key[-2]])
+        self.edit_version += 1
+        self.modified = True
+
+    @tracer.traced('save_file')
+    def save_file(self, file_path: str, compress_level: int = 1, workers: int = 0,
+                  progress: Optional[ProgressCallback] = None):
+        """Write the labels atomically with the original header and affine."""
+        if self._data_cache is None:
+            raise ValueError("No data loaded")
+        try:
+            version = self.edit_version
+            header = self._save_header()
+            dtype = header.get_data_dtype()
+            head = io.BytesIO()
+            header.write_to(head)
+            # Pad up to the data offset, which may leave room for extensions
+            head.write(b'\x00' * (int(header.get_data_offset()) - head.tell()))
+
+            # Slabs along the last axis are contiguous in NIfTI's Fortran order
+            slab_bytes = self.shape[0] * self.shape[1] * dtype.itemsize
+            step = max(1, self.SAVE_BLOCK_BYTES // max(1, slab_bytes))
+            total = slab_bytes * self.shape[2]
+            done = 0
+
+            def blocks():
+                for start in range(0, self.shape[2], step):
+                    with self._lock:
+                        if self.edit_version != version:
+                            raise RuntimeError("Labels were edited while saving")
+                        block = np.asarray(self._data_cache[:, :, start:start + step])
+                    yield block.astype(dtype, copy=False).tobytes(order='F')
+
+            def written(count: int):
+                nonlocal done
+                done += count
+                if progress is not None:
+                    progress('save', done, total)
+
+            if progress is not None:
+                progress('save', 0, total)
+            directory = os.path.dirname(os.path.abspath(file_path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp',
+                                            prefix='.' + os.path.basename(file_path) + '.')
+            try:
+                with os.fdopen(fd, 'wb') as raw:
+                    if file_path.endswith('.gz'):
+                        writer = ParallelGzipWriter(raw, compress_level, workers or os.cpu_count() or 1)
+                        try:
+                            writer.write(head.getvalue())
+                            for block in blocks():
+                                writer.write(block, lambda count=len(block): written(count))
+                            writer.finish()
+                        finally:
+                            writer.close()
+                    else:
+                        raw.write(head.getvalue())
+                        for block in blocks():
+                            raw.write(block)
+                            written(len(block))
+                    raw.flush()
+                    os.fsync(raw.fileno())
+                # mkstemp creates the file private to the user
+                if os.path.exists(file_path):
+                    shutil.copymode(file_path, tmp_path)
+                else:
+                    os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, file_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            with self._lock:
+                if self.edit_version == version:
+                    self.modified = False
+        except LoadCancelled:
+            raise
+        except Exception as e:
+            print(f"Error saving file: {e}")
+            raise
+
+    def _save_header(self) -> nib.Nifti1Header:
+        """Copy of the loaded header describing the volume as save_file writes it."""
+        header = self.nii_data.header.copy()
+        dtype = self._storage_dtype()
+        labels = self.label_index.labels
+        if dtype is not None and len(labels):
+            info = np.iinfo(dtype)
+            if labels[0] < info.min or labels[-1] > info.max:
+                dtype = None
+        if dtype is None:
+            # Labels were rounded or unscaled on load, or no longer fit the
+            # on-disk type (cached images lose the scaling); store them as they are
+            header.set_data_dtype(self._data_cache.dtype.newbyteorder(header.endianness))
+            header.set_slope_inter(1, 0)
+        header.set_data_shape(self.shape)
+        return header
+
+    def set_intensity(self, volume: Optional[IntensityVolume]):
+        """Pair an intensity image with the labels, or remove it with None."""
+        if volume is not None and tuple(volume.shape) != tuple(self.shape):
+            raise ValueError(f"Image shape {volume.shape} does not match label shape {self.shape}")
+        self.intensity = volume
+
+    def get_intensity_data(self, view: str, slice_idx: int) -> Optional[np.ndarray]:
+        """Windowed grey slice of the paired image, or None without one."""
+        intensity = self.intensity
+        if intensity is None:
+            return None
+        return intensity.get_slice(view, self._clamp_slice(view, slice_idx))
+
+    @tracer.traced('get_outline')
+    def get_outline(self, view: str, slice_idx: int) -> np.ndarray:
+        """Boundary pixels of the current label on a slice, cached read-only."""
+        slice_idx = self._clamp_slice(view, slice_idx)
+        key = (self.current_label, view, slice_idx)
+        outline = self.outline_cache.get(key)
+        if outline is None:
+            outline = outline_mask(self.get_display_data(view, slice_idx) == 2)
+            self.outline_cache.put(key, outline)
+        return outline
+
+    @tracer.traced('prefetch_slices')
+    def prefetch_slices(self, label: int, view: str, slices: List[int],
+                        is_current: Callable[[], bool] = lambda: True,
+                        all_labels: bool = False) -> int:
+        """Fill the caches for upcoming slices until ``label`` or ``is_current()`` changes."""
+        computed = 0
+        try:
+            for slice_idx in slices:
+                if not is_current():
+                    break
+                with self._lock:
+                    if label != self.current_label:
+                        break
+                    self.get_intensity_data(view, slice_idx)
+                    if all_labels:
+                        self.get_label_rows(view, slice_idx)
+                    if (label, view, slice_idx) in self.outline_cache:
+                        continue
+                    self.get_outline(view, slice_idx)
+                computed += 1
+        except Exception as e:
+            print(f"Error prefetching slices: {e}")
+        return computed
@@ -0,0 +1,59 @@
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+def _deflate_block(data: bytes, level: int) -> bytes:
+    """Raw-deflate one block independently of the others.
+
+    The block ends on a byte boundary (sync flush) without closing the
+    stream, so compressed blocks can be concatenated as they are.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+class ParallelGzipWriter:
+    """Write a single gzip member whose blocks are deflated on a thread pool.
+
+    zlib releases the GIL while compressing, so blocks compress in
+    parallel, like pigz. Blocks are written in order with at most two per
+    worker in flight; the result is an ordinary ``.gz`` file that any gzip
+    reader accepts.
+    """
+
+    def __init__(self, fileobj, level: int, workers: int):
+        self._fileobj = fileobj
+        self._level = level
+        self._pool = ThreadPoolExecutor(max(1, workers), thread_name_prefix='gzip')
+        self._pending = deque()
+        self._max_pending = 2 * max(1, workers)
+        self._crc = 0
+        self._size = 0
+        # Header: magic, deflate, no flags, mtime, no extra flags, unknown OS
+        fileobj.write(b'\x1f\x8b\x08\x00' + struct.pack('<I', int(time.time())) + b'\x00\xff')
+
+    def write(self, data: bytes, on_written: Optional[Callable[[], None]] = None):
+        """Queue a block; ``on_written`` runs once it has reached the file."""
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        self._pending.append((self._pool.submit(_deflate_block, data, self._level), on_written))
+        while len(self._pending) >= self._max_pending:
+            self._write_next()
+
+    def _write_next(self):
+        future, on_written = self._pending.popleft()
+        self._fileobj.write(future.result())
+        if on_written is not None:
+            on_written()
+
+    def finish(self):
+        """Write the remaining blocks, the final empty block and the trailer."""
+        while self._pending:
+            self._write_next()
+        self._fileobj.write(zlib.compressobj(self._level, zlib.DEFLATED, -zlib.MAX_WBITS).flush())
+        self._fileobj.write(struct.pack('<II', self._crc, self._size & 0xFFFFFFFF))
+
+    def close(self):
+        self._pool.shutdown(cancel_futures=True)
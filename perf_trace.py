@@ -0,0 +1,119 @@
+"""Lightweight timing spans for the loading and rendering hot paths.
+
+Spans are only recorded while ``tracer.enabled`` is set, so instrumented
+functions cost one attribute check otherwise. Recorded spans can be
+summarised per name or exported as a Chrome trace-event JSON file, which
+opens in chrome://tracing or https://ui.perfetto.dev.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, Tuple
+
+class PerfTracer:
+    """Collects (name, start, end, thread, args) spans in a bounded buffer."""
+
+    def __init__(self, max_events: int = 200000):
+        self.enabled = False
+        self._events: Deque[Tuple[str, int, int, int, Dict[str, Any]]] = deque(maxlen=max_events)
+        self._threads: Dict[int, str] = {}
+        self._t0 = time.perf_counter_ns()
+
+    def configure(self, enabled: bool, max_events: int):
+        self.enabled = enabled
+        if max_events != self._events.maxlen:
+            self._events = deque(self._events, maxlen=max_events)
+
+    @contextmanager
+    def span(self, name: str, **args) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self._record(name, start, time.perf_counter_ns(), args)
+
+    def traced(self, name: str):
+        """Decorator recording every call of the function as a span."""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter_ns()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self._record(name, start, time.perf_counter_ns(), {})
+            return wrapper
+        return decorate
+
+    def _record(self, name: str, start: int, end: int, args: Dict[str, Any]):
+        tid = threading.get_native_id()
+        if tid not in self._threads:
+            self._threads[tid] = threading.current_thread().name
+        # deque.append is atomic, so worker threads can record concurrently
+        self._events.append((name, start, end, tid, args))
+
+    def clear(self):
+        self._events.clear()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Call count, total and maximum milliseconds per span name."""
+        stats: Dict[str, Dict[str, float]] = {}
+        for name, start, end, _, _ in list(self._events):
+            ms = (end - start) / 1e6
+            entry = stats.setdefault(name, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            entry['count'] += 1
+            entry['total_ms'] += ms
+            entry['max_ms'] = max(entry['max_ms'], ms)
+        return stats
+
+    def export_chrome_trace(self, path: str):
+        """Write the recorded spans as Chrome trace-event JSON."""
+        pid = os.getpid()
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                   'args': {'name': thread_name}}
+                  for tid, thread_name in self._threads.items()]
+        for name, start, end, tid, args in list(self._events):
+            events.append({
+                'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                'ts': (start - self._t0) / 1000, 'dur': (end - start) / 1000,
+                'args': args,
+            })
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+class FrameStats:
+    """Frame rate and frame time over a sliding window, for the overlay."""
+
+    def __init__(self, window_s: float = 1.0):
+        self.window_s = window_s
+        self._frames: Deque[Tuple[float, float]] = deque()
+
+    def add(self, duration_s: float):
+        now = time.perf_counter()
+        self._frames.append((now, duration_s))
+        while self._frames and now - self._frames[0][0] > self.window_s:
+            self._frames.popleft()
+
+    @property
+    def fps(self) -> float:
+        return len(self._frames) / self.window_s
+
+    @property
+    def last_ms(self) -> float:
+        return self._frames[-1][1] * 1000 if self._frames else 0.0
+
+    @property
+    def max_ms(self) -> float:
+        return max((duration for _, duration in self._frames), default=0.0) * 1000
+
+# Shared by the data manager, the canvases and the main window
+tracer = PerfTracer()
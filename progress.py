@@ -0,0 +1,33 @@
+from typing import Callable
+
+# progress(stage, done, total); may raise LoadCancelled to abort a load
+ProgressCallback = Callable[[str, int, int], None]
+
+class LoadCancelled(Exception):
+    """Raised from a progress callback to abort a running load."""
+
+class ProgressReader:
+    """Read-through file wrapper that reports how many bytes were consumed."""
+
+    def __init__(self, fileobj, total: int, progress: ProgressCallback):
+        self._fileobj = fileobj
+        self._total = total
+        self._progress = progress
+        self._done = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._fileobj.read(size)
+        self._advance(len(chunk))
+        return chunk
+
+    def readinto(self, buffer) -> int:
+        count = self._fileobj.readinto(buffer)
+        self._advance(count or 0)
+        return count
+
+    def _advance(self, count: int):
+        self._done = min(self._done + count, self._total)
+        self._progress('decompress', self._done, self._total)
+
+    def __getattr__(self, name):
+        return getattr(self._fileobj, name)
@@ -0,0 +1,128 @@
+import numpy as np
+from typing import Optional, Sequence, Tuple
+
+def build_rgba_lut(colors: Sequence[Tuple[float, ...]]) -> np.ndarray:
+    """Convert float RGB(A) colours in [0, 1] into an (N, 4) uint8 lookup table."""
+    lut = np.ones((len(colors), 4), dtype=np.float64)
+    for i, color in enumerate(colors):
+        lut[i, :len(color)] = color
+    return np.round(lut * 255).astype(np.uint8)
+
+def lookup_rgba(index: np.ndarray, lut: np.ndarray) -> np.ndarray:
+    """Colour an integer index array with an (N, 4) uint8 ``lut``.
+
+    Equivalent to ``lut[index]``, but gathers packed 32-bit pixels in one
+    take, which is about twice as fast.
+    """
+    packed = np.ascontiguousarray(lut).view(np.uint32)[:, 0]
+    return packed.take(index).view(np.uint8).reshape(index.shape + (4,))
+
+def distinct_colors(labels: np.ndarray, alpha: float) -> np.ndarray:
+    """(N, 4) uint8 RGBA colours, one per label value, spread around the hue circle.
+
+    The hue steps by the golden ratio per label value, so neighbouring
+    labels differ clearly and a label keeps its colour across volumes.
+    """
+    hue = (np.asarray(labels, dtype=np.float64) * 0.618033988749895) % 1.0
+    saturation, value = 0.65, 0.95
+    # Vectorised HSV -> RGB: channel n falls off with the hue distance k from its peak
+    k = (np.array([5, 3, 1]) + hue[:, None] * 6) % 6
+    rgb = value - value * saturation * np.clip(np.minimum(k, 4 - k), 0, 1)
+    rgba = np.concatenate([rgb, np.full((len(hue), 1), alpha)], axis=1)
+    return np.round(rgba * 255).astype(np.uint8)
+
+def build_label_palette(labels: np.ndarray, current_label: Optional[int],
+                        background: Tuple[float, ...], highlight: Tuple[float, ...],
+                        alpha: float) -> np.ndarray:
+    """RGBA lookup table for palette index slices (see get_label_rows).
+
+    Entry 0 is the background and entry ``i + 1`` the colour of
+    ``labels[i]``; the current label gets the highlight colour. Built once
+    per label change, so colouring a slice is one lookup for any number of
+    labels.
+    """
+    palette = np.concatenate([build_rgba_lut([background]), distinct_colors(labels, alpha)])
+    rows = np.flatnonzero(np.asarray(labels) == current_label)
+    if len(rows):
+        palette[rows[0] + 1] = build_rgba_lut([highlight])[0]
+    return palette
+
+def build_window_lut(values: np.ndarray, window: float, level: float) -> np.ndarray:
+    """uint8 grey level of each entry of ``values`` under a window/level.
+
+    Values below ``level - window / 2`` map to 0 and values above
+    ``level + window / 2`` to 255, linearly in between.
+    """
+    window = max(float(window), 1e-6)
+    scaled = (values - (level - window / 2)) * (255 / window)
+    return np.clip(scaled + 0.5, 0, 255).astype(np.uint8)
+
+def build_overlay_table(lut: np.ndarray) -> np.ndarray:
+    """Blend every RGBA ``lut`` colour over every grey level, as packed RGBA.
+
+    Returns an (N, 256) uint32 table whose bytes are the opaque RGBA result
+    of colour ``i`` composited over grey level ``g``; see overlay_on_gray.
+    """
+    # Alpha in 0..256 so that 255 is fully opaque after the >> 8
+    alpha = lut[:, 3:].astype(np.uint16)
+    alpha += alpha >> 7
+    levels = np.arange(256, dtype=np.uint16)[None, :, None]
+    table = np.empty((len(lut), 256, 4), dtype=np.uint8)
+    table[..., :3] = (levels * (256 - alpha)[:, None, :]
+                      + (lut[:, :3].astype(np.uint16) * alpha)[:, None, :]) >> 8
+    table[..., 3] = 255
+    return table.view(np.uint32)[..., 0]
+
+def overlay_on_gray(gray: np.ndarray, display: np.ndarray, table: np.ndarray) -> np.ndarray:
+    """Colour an index slice over a uint8 grey slice with one table lookup.
+
+    ``table`` comes from build_overlay_table; both slices must be in the
+    same order. The result is a contiguous opaque RGBA image.
+    """
+    index = display.astype(np.intp) * 256
+    index += gray
+    return table.take(index).view(np.uint8).reshape(gray.shape + (4,))
+
+def outline_mask(mask: np.ndarray) -> np.ndarray:
+    """Boundary pixels of a 2D boolean mask, found with shifted comparisons.
+
+    A pixel is on the outline when it belongs to the mask but at least one of
+    its four neighbours does not; pixels on the array border are only marked
+    when an in-array neighbour is outside the mask, like a 0.5 contour.
+    """
+    inner = mask.copy()
+    inner[1:, :] &= mask[:-1, :]
+    inner[:-1, :] &= mask[1:, :]
+    inner[:, 1:] &= mask[:, :-1]
+    inner[:, :-1] &= mask[:, 1:]
+    return mask & ~inner
+
+def to_screen(image: np.ndarray, origin_lower: bool = True) -> np.ndarray:
+    """View an (x, y) slice as (row, column) screen order, like imshow(data.T)."""
+    image = image.T
+    return image[::-1] if origin_lower else image
+
+def alpha_over(top: np.ndarray, bottom: np.ndarray) -> np.ndarray:
+    """Composite uint8 RGBA ``top`` over ``bottom`` (broadcastable shapes)."""
+    top = top.astype(np.float32) / 255
+    bottom = bottom.astype(np.float32) / 255
+    top_a, bottom_a = top[..., 3:], bottom[..., 3:]
+    out_a = top_a + bottom_a * (1 - top_a)
+    out_rgb = top[..., :3] * top_a + bottom[..., :3] * bottom_a * (1 - top_a)
+    out_rgb = np.divide(out_rgb, out_a, out=np.zeros_like(out_rgb), where=out_a > 0)
+    return np.round(np.concatenate([out_rgb, out_a], axis=-1) * 255).astype(np.uint8)
+
+def colorize_slice(display: np.ndarray, lut: np.ndarray,
+                   outline: Optional[np.ndarray] = None,
+                   outline_rgba: Optional[np.ndarray] = None,
+                   origin_lower: bool = True) -> np.ndarray:
+    """Turn an (x, y) index slice into a screen-ordered RGBA image.
+
+    Colours come from one lookup into ``lut``; outline pixels, if given, are
+    alpha-composited with ``outline_rgba`` on top.
+    """
+    rgba = lookup_rgba(to_screen(display, origin_lower), lut)
+    if outline is not None:
+        edge = to_screen(outline, origin_lower)
+        rgba[edge] = alpha_over(outline_rgba, rgba[edge])
+    return rgba
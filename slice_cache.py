@@ -0,0 +1,56 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from typing import Callable, Hashable, Optional
+
+class SliceCache:
+    """Per-slice arrays keyed by e.g. (label, view, slice), bounded in bytes.
+
+    Arrays are stored read-only and handed out as-is, so revisiting a slice
+    costs a dictionary lookup; the least recently used arrays are dropped
+    once ``max_bytes`` is exceeded. Safe to share with the prefetch thread.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._arrays: 'OrderedDict[Hashable, np.ndarray]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        with self._lock:
+            array = self._arrays.get(key)
+            if array is not None:
+                self._arrays.move_to_end(key)
+            return array
+
+    def put(self, key: Hashable, array: np.ndarray):
+        if array.nbytes > self.max_bytes:
+            return
+        array.setflags(write=False)
+        with self._lock:
+            old = self._arrays.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._arrays[key] = array
+            self.nbytes += array.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._arrays.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._arrays.clear()
+            self.nbytes = 0
+
+    def discard(self, predicate: Callable[[Hashable], bool]):
+        """Drop the arrays whose key matches ``predicate``."""
+        with self._lock:
+            for key in [key for key in self._arrays if predicate(key)]:
+                self.nbytes -= self._arrays.pop(key).nbytes
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._arrays
+
+    def __len__(self) -> int:
+        return len(self._arrays)
@@ -0,0 +1,295 @@
+import numpy as np
+from typing import Optional, Tuple
+from PyQt6.QtWidgets import QWidget, QSizePolicy
+from PyQt6.QtCore import Qt, QRectF, QPointF
+from PyQt6.QtGui import QPainter, QImage, QColor, qRgba
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+
+from config import DISPLAY_CONFIG, LABELS
+from render_utils import (build_rgba_lut, build_overlay_table, overlay_on_gray, lookup_rgba,
+                          colorize_slice, to_screen, alpha_over)
+from perf_trace import tracer
+
+class MatplotlibSliceCanvas(FigureCanvas):
+    """基于matplotlib的切片画布，支持持久图像对象与局部重绘"""
+
+    def __init__(self, parent=None):
+        # 创建带透明背景的matplotlib图形
+        figure = Figure(figsize=DISPLAY_CONFIG['figure_size'])
+        figure.patch.set_facecolor((0, 0, 0, 0))  # 完全透明背景
+        super().__init__(figure)
+        self.setParent(parent)
+
+        # 创建子图
+        self.ax = self.figure.add_subplot(111)
+        self.ax.set_facecolor(DISPLAY_CONFIG['axes_background'])  # 半透明背景
+
+        # 完全移除坐标轴
+        self.ax.set_axis_off()
+
+        # 调整子图参数
+        self.figure.subplots_adjust(left=0, right=1, bottom=0, top=1, wspace=0, hspace=0)
+
+        self.mpl_connect('draw_event', self._on_canvas_draw)
+        self.setStyleSheet("""
+            background-color: transparent;
+            border: none;
+        """)
+
+        # 持久渲染使用的RGBA图像对象及背景缓存
+        self._image = None
+        self._background = None
+        # 最近绘制的切片尺寸 (行, 列)，用于把鼠标位置换算为切片下标
+        self._slice_shape = None
+        self._lut = build_rgba_lut(DISPLAY_CONFIG['label_colors'])
+        # 有影像底图时按 (标签类别, 灰度) 查表得到混合后的颜色
+        self._overlay_table = build_overlay_table(build_rgba_lut(DISPLAY_CONFIG['overlay_label_colors']))
+        # 最近一次使用的调色板及其叠加表，标签变化时才重建
+        self._palette = None
+        self._palette_table = None
+        self._outline_rgba = build_rgba_lut([DISPLAY_CONFIG['outline_color']])[0]
+
+        # 画布只在有数据时创建，随后的draw_slice会完成首次绘制；
+        # 不再绘制占位文字，也就不会触发字体查找
+
+    def prepare_slice(self, colored_data: np.ndarray, outline: Optional[np.ndarray],
+                      base: Optional[np.ndarray] = None, palette: Optional[np.ndarray] = None):
+        """生成屏幕顺序的最终RGBA图像（标签着色、影像底图与轮廓合成）；
+        只用NumPy，可以在工作线程中调用，GUI线程只需更新图像对象并blit"""
+        origin_lower = DISPLAY_CONFIG['origin'] == 'lower'
+        lut = self._lut if palette is None else palette
+        with tracer.span('mpl.lut'):
+            if base is None:
+                rgba = colorize_slice(colored_data, lut, outline, self._outline_rgba, origin_lower)
+            else:
+                table = self._overlay_table if palette is None else self._overlay_table_for(palette)
+                rgba = overlay_on_gray(to_screen(base, origin_lower),
+                                       to_screen(colored_data, origin_lower), table)
+                if outline is not None:
+                    edge = to_screen(outline, origin_lower)
+                    rgba[edge] = alpha_over(self._outline_rgba, rgba[edge])
+        return rgba, outline is None
+
+    def _overlay_table_for(self, palette: np.ndarray) -> np.ndarray:
+        if palette is not self._palette:
+            self._palette_table = build_overlay_table(palette)
+            self._palette = palette
+        return self._palette_table
+
+    def show_prepared(self, prepared):
+        rgba, preview = prepared
+        # 缓冲区为 (行=y, 列=x)
+        self._slice_shape = rgba.shape[1::-1]
+        if DISPLAY_CONFIG['render_mode'] == 'redraw':
+            self._redraw_view(rgba, preview)
+        else:
+            self._blit_view(rgba, preview)
+
+    def draw_slice(self, colored_data: np.ndarray, outline: Optional[np.ndarray],
+                   base: Optional[np.ndarray] = None, palette: Optional[np.ndarray] = None):
+        """绘制切片；outline为None时为拖动预览，使用最近邻插值且不画轮廓；
+        base为窗宽窗位映射后的uint8影像切片，绘制在标签下方；
+        palette为 (N, 4) uint8 RGBA调色板，用于同时显示所有标签"""
+        self.show_prepared(self.prepare_slice(colored_data, outline, base, palette))
+
+    def slice_position(self, pos: QPointF) -> Optional[Tuple[int, int]]:
+        """窗口坐标对应的切片数组下标 (行, 列)，不在切片上时为None"""
+        if self._slice_shape is None:
+            return None
+        x, y = self.ax.transData.inverted().transform(self.mouseEventCoords(pos))
+        # 图像按转置显示：横轴为切片的行，纵轴为列
+        row, col = int(round(x)), int(round(y))
+        if DISPLAY_CONFIG['origin'] != 'lower':
+            col = self._slice_shape[1] - 1 - col
+        if 0 <= row < self._slice_shape[0] and 0 <= col < self._slice_shape[1]:
+            return row, col
+        return None
+
+    def _show_image(self, rgba: np.ndarray, preview: bool):
+        # RGBA已是屏幕顺序，统一按origin='upper'显示
+        height, width = rgba.shape[:2]
+        self._image = self.ax.imshow(rgba,
+                                     extent=(-0.5, width-0.5, -0.5, height-0.5),
+                                     origin='upper',
+                                     interpolation='nearest' if preview else 'bilinear',
+                                     animated=DISPLAY_CONFIG['render_mode'] != 'redraw')
+        self.ax.set_xlim(-0.5, width-0.5)
+        self.ax.set_ylim(-0.5, height-0.5)
+
+    def _redraw_view(self, rgba: np.ndarray, preview: bool):
+        """每帧清空并重建图像（旧的渲染模式）"""
+        self._image = None
+        self.ax.clear()
+
+        # 确保深色背景
+        self.ax.set_facecolor(DISPLAY_CONFIG['axes_background'])
+        with tracer.span('mpl.imshow'):
+            self._show_image(rgba, preview)
+
+        # 移除刻度并确保坐标轴不扩展
+        self.ax.set_axis_off()
+
+        # 确保紧凑布局并重绘
+        with tracer.span('mpl.tight_layout'):
+            self.figure.tight_layout()
+        with tracer.span('mpl.draw'):
+            self.draw()
+
+    def _blit_view(self, rgba: np.ndarray, preview: bool):
+        """复用持久的RGBA图像对象，只更新数据并重绘坐标轴区域"""
+        # 尺寸变化时重建图像对象
+        if self._image is None or self._image.get_array().shape != rgba.shape:
+            self._create_artists(rgba, preview)
+            return
+
+        self._image.set_interpolation('nearest' if preview else 'bilinear')
+        self._image.set_data(rgba)
+        if self._background is None:
+            with tracer.span('mpl.draw'):
+                self.draw()
+            return
+        with tracer.span('mpl.blit'):
+            self.restore_region(self._background)
+            self.ax.draw_artist(self._image)
+            self.blit(self.ax.bbox)
+
+    def _create_artists(self, rgba: np.ndarray, preview: bool):
+        """每个切片尺寸只创建一次图像对象"""
+        self.ax.clear()
+        self.ax.set_facecolor(DISPLAY_CONFIG['axes_background'])
+        self.ax.set_axis_off()
+        self._show_image(rgba, preview)
+
+        with tracer.span('mpl.tight_layout'):
+            self.figure.tight_layout()
+        with tracer.span('mpl.draw'):
+            self.draw()
+
+    def _on_canvas_draw(self, event):
+        # 完整重绘（包括窗口缩放）后缓存背景，再画出动画对象
+        self._background = None
+        if self._image is None or not self._image.get_animated():
+            return
+        self._background = self.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self._image)
+
+class QPainterSliceCanvas(QWidget):
+    """直接用QPainter绘制切片的轻量画布，不经过matplotlib"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumSize(100, 100)
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        self._lut = build_rgba_lut(DISPLAY_CONFIG['label_colors'])
+        # 有影像底图时按 (标签类别, 灰度) 查表得到混合后的颜色
+        self._overlay_table = build_overlay_table(build_rgba_lut(DISPLAY_CONFIG['overlay_label_colors']))
+        # 最近一次使用的调色板及其叠加表，标签变化时才重建
+        self._palette = None
+        self._palette_table = None
+        outline_rgba = build_rgba_lut([DISPLAY_CONFIG['outline_color']])[0]
+        self._outline_colors = [qRgba(0, 0, 0, 0), qRgba(*(int(c) for c in outline_rgba))]
+        self._background = QColor.fromRgbF(*DISPLAY_CONFIG['axes_background'])
+        # QImage直接引用这些NumPy缓冲区，必须保持引用
+        self._rgba = None
+        self._outline_bytes = None
+        self._image = None
+        self._outline = None
+        self._preview = False
+
+    def draw_slice(self, colored_data: np.ndarray, outline: Optional[np.ndarray],
+                   base: Optional[np.ndarray] = None, palette: Optional[np.ndarray] = None):
+        """绘制切片；outline为None时为拖动预览，不做平滑缩放也不画轮廓"""
+        self.show_prepared(self.prepare_slice(colored_data, outline, base, palette))
+
+    def prepare_slice(self, colored_data: np.ndarray, outline: Optional[np.ndarray],
+                      base: Optional[np.ndarray] = None, palette: Optional[np.ndarray] = None):
+        """生成RGBA和轮廓缓冲区；只用NumPy，可以在工作线程中调用。
+        有影像底图时标签颜色按叠加配色混合到灰度图上；
+        给出palette时colored_data为调色板索引，用palette代替固定的三类配色"""
+        preview = outline is None
+        if outline is None:
+            outline = np.zeros(colored_data.shape, dtype=bool)
+
+        # 转置为 (行=y, 列=x)，origin为lower时上下翻转
+        colored_t = colored_data.T
+        outline_t = outline.T
+        if DISPLAY_CONFIG['origin'] == 'lower':
+            colored_t = colored_t[::-1]
+            outline_t = outline_t[::-1]
+
+        # 一次查表生成连续的RGBA缓冲区
+        with tracer.span('qpainter.lut'):
+            if base is None:
+                rgba = lookup_rgba(colored_t, self._lut if palette is None else palette)
+            else:
+                base_t = base.T[::-1] if DISPLAY_CONFIG['origin'] == 'lower' else base.T
+                table = self._overlay_table if palette is None else self._overlay_table_for(palette)
+                rgba = overlay_on_gray(base_t, colored_t, table)
+        return rgba, np.ascontiguousarray(outline_t).view(np.uint8), preview
+
+    def _overlay_table_for(self, palette: np.ndarray) -> np.ndarray:
+        if palette is not self._palette:
+            self._palette_table = build_overlay_table(palette)
+            self._palette = palette
+        return self._palette_table
+
+    def show_prepared(self, prepared):
+        """用准备好的缓冲区零拷贝创建QImage并请求重绘，只能在GUI线程调用"""
+        self._rgba, self._outline_bytes, self._preview = prepared
+        height, width = self._rgba.shape[:2]
+        self._image = QImage(self._rgba.data, width, height, width * 4,
+                             QImage.Format.Format_RGBA8888)
+        self._outline = QImage(self._outline_bytes.data, width, height, width,
+                               QImage.Format.Format_Indexed8)
+        self._outline.setColorTable(self._outline_colors)
+        self.update()
+
+    def slice_position(self, pos: QPointF) -> Optional[Tuple[int, int]]:
+        """窗口坐标对应的切片数组下标 (行, 列)，不在切片上时为None"""
+        if self._image is None:
+            return None
+        target = self._target_rect()
+        height, width = self._rgba.shape[:2]
+        # 缓冲区的列为切片的行，缓冲区的行为切片的列（origin为lower时上下翻转）
+        row = int((pos.x() - target.x()) / target.width() * width)
+        col = int((pos.y() - target.y()) / target.height() * height)
+        if DISPLAY_CONFIG['origin'] == 'lower':
+            col = height - 1 - col
+        if pos.x() >= target.x() and pos.y() >= target.y() and 0 <= row < width and 0 <= col < height:
+            return row, col
+        return None
+
+    def _target_rect(self) -> QRectF:
+        # 等比例缩放并居中，与imshow的aspect='equal'一致
+        width, height = self._image.width(), self._image.height()
+        scale = min(self.width() / width, self.height() / height)
+        target_w, target_h = width * scale, height * scale
+        return QRectF((self.width() - target_w) / 2, (self.height() - target_h) / 2,
+                      target_w, target_h)
+
+    @tracer.traced('qpainter.paint')
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        if self._image is None:
+            painter.fillRect(self.rect(), self._background)
+            painter.setPen(QColor.fromRgbF(1, 1, 1, 0.8))
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, LABELS['please_load'])
+            painter.end()
+            return
+
+        target = self._target_rect()
+        painter.fillRect(target, self._background)
+        # 双线性平滑与matplotlib的bilinear插值一致，轮廓保持像素清晰
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, not self._preview)
+        painter.drawImage(target, self._image)
+        if not self._preview:
+            painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, False)
+            painter.drawImage(target, self._outline)
+        painter.end()
+
+def create_slice_canvas(parent=None) -> QWidget:
+    """根据 DISPLAY_CONFIG['render_backend'] 创建切片画布"""
+    if DISPLAY_CONFIG['render_backend'] == 'qpainter':
+        return QPainterSliceCanvas(parent)
+    return MatplotlibSliceCanvas(parent)
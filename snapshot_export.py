@@ -0,0 +1,153 @@
+"""Headless export of optimal-slice snapshots for every label.
+
+Usage:
+    python snapshot_export.py [directory] [--output-dir DIR] [--mode sheet|tiles]
+                              [--scale N] [--labels-per-sheet N] [--workers N]
+
+For each file and each label, the axial, coronal and sagittal slices chosen
+by get_optimal_slices are rendered with the viewer's colour scheme
+(DISPLAY_CONFIG['label_colors'] plus the label outline). Slices come from
+one LabelIndex pass per volume, so no full-volume mask is built per label.
+Files are processed in parallel worker processes; no Qt or matplotlib is
+needed. Outputs mirror the input tree, so cases with the same file name in
+different folders do not overwrite each other.
+"""
+import argparse
+import contextlib
+import multiprocessing
+import os
+import sys
+from collections import Counter
+from typing import Dict, Any, Iterator, List, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from config import FILE_CONFIG, DISPLAY_CONFIG, GRID_CONFIG
+from label_inventory import find_nifti_files
+from nifti_utils import NiftiDataManager
+from render_utils import build_rgba_lut, colorize_slice, alpha_over
+
+VIEWS = [view.lower() for view in GRID_CONFIG['views']]
+# Width of the label caption column on contact sheets
+CAPTION_WIDTH = 72
+CELL_PADDING = 4
+
+def case_names(files: List[str], directory: str) -> List[str]:
+    """Output name per file: its path relative to ``directory`` without the suffix.
+
+    Files that would share a name (``x.nii`` next to ``x.nii.gz``) keep the
+    full file name instead.
+    """
+    relative = [os.path.relpath(path, directory) for path in files]
+    stems = []
+    for name in relative:
+        for suffix in ('.nii.gz', '.nii'):
+            if name.endswith(suffix):
+                name = name[:-len(suffix)]
+                break
+        stems.append(name)
+    counts = Counter(stems)
+    return [stem if counts[stem] == 1 else name for stem, name in zip(stems, relative)]
+
+def render_label_tiles(manager: NiftiDataManager, label: int, scale: int) -> List[np.ndarray]:
+    """RGB tiles of the three optimal slices of one label, in VIEWS order."""
+    lut = build_rgba_lut(DISPLAY_CONFIG['label_colors'])
+    outline_rgba = build_rgba_lut([DISPLAY_CONFIG['outline_color']])[0]
+    background = build_rgba_lut([DISPLAY_CONFIG['axes_background'][:3]])[0]
+    origin_lower = DISPLAY_CONFIG['origin'] == 'lower'
+
+    # Optimal slices are an index lookup; no full-volume pass per label
+    manager.set_current_label(label)
+    tiles = []
+    for view in VIEWS:
+        slice_idx = manager.current_slices[view]
+        rgba = colorize_slice(manager.get_display_data(view, slice_idx), lut,
+                              manager.get_outline(view, slice_idx), outline_rgba, origin_lower)
+        rgb = alpha_over(rgba, background)[..., :3]
+        if scale > 1:
+            rgb = rgb.repeat(scale, axis=0).repeat(scale, axis=1)
+        tiles.append(rgb)
+    return tiles
+
+def build_sheet(rows: List[Tuple[int, List[np.ndarray]]]) -> Image.Image:
+    """Lay out one row per label and one column per view, with captions."""
+    cell_h = max(tile.shape[0] for _, tiles in rows for tile in tiles) + CELL_PADDING
+    cell_w = max(tile.shape[1] for _, tiles in rows for tile in tiles) + CELL_PADDING
+    sheet = Image.new('RGB', (CAPTION_WIDTH + cell_w * len(VIEWS), cell_h * len(rows)),
+                      DISPLAY_CONFIG['figure_facecolor'])
+    draw = ImageDraw.Draw(sheet)
+    for row, (label, tiles) in enumerate(rows):
+        top = row * cell_h
+        draw.text((8, top + cell_h // 2), f"label {label}", fill=DISPLAY_CONFIG['text_color'])
+        for col, tile in enumerate(tiles):
+            sheet.paste(Image.fromarray(tile), (CAPTION_WIDTH + col * cell_w, top))
+    return sheet
+
+def export_file(task: Tuple[str, str, str, str, int, int]) -> Dict[str, Any]:
+    """Render every label of one file; returns the written paths."""
+    file_path, case, output_dir, mode, scale, labels_per_sheet = task
+    manager = NiftiDataManager()
+    with contextlib.redirect_stdout(sys.stderr):
+        loaded = manager.load_file(file_path)
+    if not loaded:
+        return {'file': file_path, 'error': 'load failed'}
+
+    outputs = []
+    labels = [int(label) for label in manager.label_index.labels]
+    if mode == 'tiles':
+        case_dir = os.path.join(output_dir, case)
+        os.makedirs(case_dir, exist_ok=True)
+        for label in labels:
+            for view, tile in zip(VIEWS, render_label_tiles(manager, label, scale)):
+                path = os.path.join(case_dir, f"label_{label}_{view}.png")
+                Image.fromarray(tile).save(path)
+                outputs.append(path)
+    else:
+        os.makedirs(os.path.dirname(os.path.join(output_dir, case)), exist_ok=True)
+        for page, start in enumerate(range(0, len(labels), labels_per_sheet)):
+            rows = [(label, render_label_tiles(manager, label, scale))
+                    for label in labels[start:start + labels_per_sheet]]
+            path = os.path.join(output_dir, f"{case}_sheet{page + 1}.png")
+            build_sheet(rows).save(path)
+            outputs.append(path)
+    return {'file': file_path, 'labels': len(labels), 'outputs': outputs}
+
+def iter_exports(tasks: List[Tuple], workers: int) -> Iterator[Dict[str, Any]]:
+    """Yield per-file results in completion order, one file per worker at a time."""
+    if workers <= 1:
+        for task in tasks:
+            yield export_file(task)
+        return
+    with multiprocessing.Pool(workers, maxtasksperchild=16) as pool:
+        yield from pool.imap_unordered(export_file, tasks, chunksize=1)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export optimal-slice snapshots per label.")
+    parser.add_argument('directory', nargs='?', default=FILE_CONFIG['initial_dir'])
+    parser.add_argument('--output-dir', default='./snapshots')
+    parser.add_argument('--mode', choices=['sheet', 'tiles'], default='sheet')
+    parser.add_argument('--scale', type=int, default=1, help="integer upsampling factor")
+    parser.add_argument('--labels-per-sheet', type=int, default=24)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    files = find_nifti_files(args.directory)
+    if not files:
+        print(f"No NIfTI files found in {args.directory}", file=sys.stderr)
+        return 1
+
+    tasks = [(path, case, args.output_dir, args.mode, max(1, args.scale), max(1, args.labels_per_sheet))
+             for path, case in zip(files, case_names(files, args.directory))]
+    workers = max(1, min(args.workers, len(files)))
+    failed = 0
+    for result in iter_exports(tasks, workers):
+        if 'error' in result:
+            failed += 1
+            print(f"{result['file']}: {result['error']}", file=sys.stderr)
+        else:
+            print(f"{result['file']}: {result['labels']} labels -> {len(result['outputs'])} images")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
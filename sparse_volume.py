@@ -0,0 +1,216 @@
+import numpy as np
+from typing import Iterator, Optional, Tuple
+
+from progress import ProgressCallback
+
+# Integer dtypes labels are stored in, smallest first
+LABEL_DTYPES = (np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32, np.int64)
+
+def label_dtype(lo: int, hi: int, current: Optional[np.dtype] = None) -> np.dtype:
+    """Smallest integer dtype holding [lo, hi], or ``current`` widened only if it does not."""
+    if current is not None and np.issubdtype(current, np.integer):
+        info = np.iinfo(current)
+        if info.min <= lo and hi <= info.max:
+            return np.dtype(current)
+    dtype = next((np.dtype(d) for d in LABEL_DTYPES
+                  if np.iinfo(d).min <= lo and hi <= np.iinfo(d).max), np.dtype(np.int64))
+    return dtype if current is None else np.promote_types(current, dtype)
+
+class BlockSparseVolume:
+    """Label volume stored as cubic blocks, with all-background blocks omitted.
+
+    ``block_index`` maps each block position to a row of ``blocks`` or -1
+    for an empty (all zero) block, so memory scales with the labelled
+    region rather than the field of view. Indexing with integers and
+    contiguous slices, as the viewer does for slices, slabs and bounding
+    boxes, returns a dense ndarray assembled from the stored blocks only.
+    Individual voxels can be read and written with three coordinate arrays,
+    as label edits do; writes allocate blocks as needed.
+    """
+
+    def __init__(self, shape: Tuple[int, int, int], block_size: int,
+                 block_index: np.ndarray, blocks: np.ndarray):
+        self.shape = tuple(int(n) for n in shape)
+        self.block_size = block_size
+        self.block_index = block_index
+        self.blocks = blocks
+
+    @classmethod
+    def from_dataobj(cls, dataobj, block_size: int = 32,
+                     progress: Optional[ProgressCallback] = None) -> 'BlockSparseVolume':
+        """Build from an array or nibabel array proxy, one block layer at a time.
+
+        Only ``block_size`` slices along the last axis are dense in memory at
+        once, so proxies of files larger than memory can be converted.
+        """
+        shape = tuple(int(n) for n in dataobj.shape)
+        b = block_size
+        grid = tuple(-(-n // b) for n in shape)
+        block_index = np.full(grid, -1, dtype=np.int32)
+        layers = []
+        n_blocks = 0
+        for bz in range(grid[2]):
+            if progress is not None:
+                progress('sparse', bz, grid[2])
+            slab = cls._label_slab(np.asanyarray(dataobj[:, :, bz * b:(bz + 1) * b]))
+            padded = np.zeros((grid[0] * b, grid[1] * b, b), dtype=slab.dtype)
+            padded[:shape[0], :shape[1], :slab.shape[2]] = slab
+            layer = padded.reshape(grid[0], b, grid[1], b, b).transpose(0, 2, 1, 3, 4)
+            occupied = layer.reshape(grid[0], grid[1], -1).any(axis=2)
+            count = int(occupied.sum())
+            block_index[:, :, bz][occupied] = np.arange(n_blocks, n_blocks + count)
+            layers.append(layer[occupied])
+            n_blocks += count
+
+        blocks = np.concatenate(layers) if layers else np.zeros((0, b, b, b), dtype=np.uint8)
+        if not np.issubdtype(blocks.dtype, np.integer) or blocks.dtype.itemsize > 1:
+            # Slabs of float storage come back as int64; narrow once at the end
+            lo, hi = (int(blocks.min()), int(blocks.max())) if blocks.size else (0, 0)
+            blocks = blocks.astype(label_dtype(lo, hi))
+        return cls(shape, b, block_index, blocks)
+
+    @staticmethod
+    def _label_slab(slab: np.ndarray) -> np.ndarray:
+        if np.issubdtype(slab.dtype, np.integer):
+            return slab
+        if not np.all(np.isfinite(slab)):
+            raise ValueError("Label volume contains non-finite values")
+        return np.rint(slab).astype(np.int64)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.blocks.dtype
+
+    @property
+    def ndim(self) -> int:
+        return 3
+
+    @property
+    def size(self) -> int:
+        """Number of voxels, as for a dense array."""
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes actually held: stored blocks plus the block index."""
+        return self.blocks.nbytes + self.block_index.nbytes
+
+    @property
+    def occupied_fraction(self) -> float:
+        return len(self.blocks) / max(1, self.block_index.size)
+
+    def _value_range(self) -> Tuple[int, int]:
+        lo, hi = (int(self.blocks.min()), int(self.blocks.max())) if len(self.blocks) else (0, 0)
+        if len(self.blocks) < self.block_index.size:
+            # Omitted blocks are background
+            lo, hi = min(lo, 0), max(hi, 0)
+        return lo, hi
+
+    def min(self) -> int:
+        """Smallest stored value; edge-block padding counts as background."""
+        return self._value_range()[0]
+
+    def max(self) -> int:
+        return self._value_range()[1]
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self[:, :, :]
+        return dense if dtype is None else dense.astype(dtype)
+
+    def _voxel_rows(self, coords: Tuple[np.ndarray, ...]) -> Tuple[np.ndarray, Tuple[np.ndarray, ...]]:
+        # Row of the block holding each voxel (-1 if omitted) and the offsets within it
+        b = self.block_size
+        rows = self.block_index[tuple(c // b for c in coords)]
+        return rows, tuple(c % b for c in coords)
+
+    def __getitem__(self, key) -> np.ndarray:
+        if isinstance(key, tuple) and len(key) == 3 and all(isinstance(k, np.ndarray) for k in key):
+            rows, local = self._voxel_rows(key)
+            out = np.zeros(rows.shape, dtype=self.dtype)
+            stored = rows >= 0
+            out[stored] = self.blocks[(rows[stored],) + tuple(c[stored] for c in local)]
+            return out
+        if not isinstance(key, tuple):
+            key = (key,)
+        key = key + (slice(None),) * (3 - len(key))
+        if len(key) != 3:
+            raise IndexError("BlockSparseVolume takes at most 3 indices")
+
+        b = self.block_size
+        block_ranges, local, crops, squeeze = [], [], [], []
+        for axis, (item, n) in enumerate(zip(key, self.shape)):
+            if isinstance(item, slice):
+                start, stop, step = item.indices(n)
+                if step != 1:
+                    raise IndexError("BlockSparseVolume only supports contiguous slices")
+                stop = max(start, stop)
+                first, last = start // b, -(-stop // b)
+                block_ranges.append(slice(first, max(first, last)))
+                local.append(slice(None))
+                crops.append(slice(start - first * b, stop - first * b))
+            else:
+                index = int(item)
+                if index < 0:
+                    index += n
+                if not 0 <= index < n:
+                    raise IndexError(f"index {item} is out of bounds for axis {axis} with size {n}")
+                block_ranges.append(slice(index // b, index // b + 1))
+                local.append(slice(index % b, index % b + 1))
+                crops.append(slice(0, 1))
+                squeeze.append(axis)
+
+        sub_index = self.block_index[tuple(block_ranges)]
+        widths = [b if isinstance(item, slice) else 1 for item in key]
+        out = np.zeros(tuple(g * w for g, w in zip(sub_index.shape, widths)), dtype=self.dtype)
+        gx, gy, gz = np.nonzero(sub_index >= 0)
+        if len(gx):
+            # Narrow the blocks to the requested planes before gathering them
+            data = self.blocks[(slice(None),) + tuple(local)][sub_index[gx, gy, gz]]
+            tiled = out.reshape(sub_index.shape[0], widths[0], sub_index.shape[1], widths[1],
+                                sub_index.shape[2], widths[2])
+            tiled[gx, :, gy, :, gz, :] = data
+        out = out[tuple(crops)]
+        return out.squeeze(axis=tuple(squeeze)) if squeeze else out
+
+    def __setitem__(self, key, values):
+        """Write voxels given as three coordinate arrays, e.g. ``volume[x, y, z] = v``.
+
+        Blocks are allocated for non-zero writes into omitted blocks and the
+        block dtype is widened when a value does not fit. Blocks that become
+        empty stay stored.
+        """
+        if not (isinstance(key, tuple) and len(key) == 3 and all(isinstance(k, np.ndarray) for k in key)):
+            raise IndexError("BlockSparseVolume only supports writes with coordinate arrays")
+        values = np.broadcast_to(np.asarray(values), key[0].shape)
+        if values.size:
+            dtype = label_dtype(int(values.min()), int(values.max()), self.dtype)
+            if dtype != self.dtype:
+                self.blocks = self.blocks.astype(dtype)
+
+        b = self.block_size
+        rows, local = self._voxel_rows(key)
+        missing = (rows < 0) & (values != 0)
+        if missing.any():
+            positions = np.unique(np.stack([c[missing] // b for c in key], axis=1), axis=0)
+            start = len(self.blocks)
+            # Publish the grown blocks before the index that refers to them,
+            # so a concurrent reader never sees a row that does not exist yet
+            self.blocks = np.concatenate([self.blocks,
+                                          np.zeros((len(positions), b, b, b), dtype=self.dtype)])
+            self.block_index[tuple(positions.T)] = np.arange(start, start + len(positions))
+            rows, local = self._voxel_rows(key)
+        stored = rows >= 0
+        self.blocks[(rows[stored],) + tuple(c[stored] for c in local)] = values[stored]
+
+    def iter_block_groups(self, max_voxels: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield (origins, blocks) for the stored blocks, about ``max_voxels`` at a time.
+
+        ``origins`` is a (k, 3) array of each block's first voxel. Blocks on
+        the far edges are zero-padded past the volume shape.
+        """
+        positions = np.argwhere(self.block_index >= 0)
+        rows = self.block_index[tuple(positions.T)]
+        per_group = max(1, max_voxels // self.block_size ** 3)
+        for start in range(0, len(rows), per_group):
+            group = slice(start, start + per_group)
+            yield positions[group] * self.block_size, self.blocks[rows[group]]
@@ -0,0 +1,116 @@
+"""Incremental label index and statistics updates against a full rebuild."""
+import numpy as np
+import nibabel as nib
+import pytest
+
+from label_index import VIEW_AXES, LabelIndex
+from label_stats import LabelStatistics
+from nifti_utils import NiftiDataManager
+
+SHAPE = (40, 36, 28)
+STEPS = 60
+
+
+def random_labels(rng: np.random.Generator) -> np.ndarray:
+    data = np.zeros(SHAPE, dtype=np.uint8)
+    for label in range(1, 8):
+        start = [int(rng.integers(0, n - 4)) for n in SHAPE]
+        size = [int(rng.integers(3, 15)) for _ in SHAPE]
+        data[tuple(slice(s, s + w) for s, w in zip(start, size))] = label
+    return data
+
+
+def assert_matches_rebuild(manager: NiftiDataManager, expected: np.ndarray):
+    assert np.array_equal(np.asarray(manager._data_cache), expected)
+    index, rebuilt = manager.label_index, LabelIndex.build(expected)
+    assert np.array_equal(index.labels, rebuilt.labels)
+    assert np.array_equal(index.counts, rebuilt.counts)
+    assert np.array_equal(index.bboxes, rebuilt.bboxes)
+    for view in VIEW_AXES:
+        assert np.array_equal(index.occupancy[view], rebuilt.occupancy[view])
+
+    stats = manager.label_stats
+    rebuilt = LabelStatistics.compute(expected, rebuilt.labels, stats.zooms, stats.affine)
+    assert np.array_equal(stats.labels, rebuilt.labels)
+    assert np.array_equal(stats.voxels, rebuilt.voxels)
+    assert np.array_equal(stats.bboxes, rebuilt.bboxes)
+    assert np.array_equal(stats.faces, rebuilt.faces)
+    assert np.allclose(stats.centroids, rebuilt.centroids)
+
+
+@pytest.mark.parametrize('sparse', [False, True])
+@pytest.mark.parametrize('seed', range(4))
+def test_random_edits_match_rebuild(tmp_path, sparse, seed):
+    rng = np.random.default_rng(seed)
+    original = random_labels(rng)
+    path = str(tmp_path / 'labels.nii.gz')
+    nib.save(nib.Nifti1Image(original, np.diag([0.5, 0.7, 2.0, 1.0])), path)
+
+    manager = NiftiDataManager(sparse=sparse)
+    assert manager.load_file(path)
+    manager.get_label_statistics()
+    expected = original.copy()
+    # Volumes before each undoable edit, and after each undone one
+    undo_states, redo_states = [], []
+
+    for step in range(STEPS):
+        before = expected.copy()
+        op = rng.integers(0, 5)
+        if op < 2:
+            view = ['axial', 'coronal', 'sagittal'][step % 3]
+            axis = VIEW_AXES[view]
+            slice_idx = int(rng.integers(0, SHAPE[axis]))
+            rows, cols = (n for a, n in enumerate(SHAPE) if a != axis)
+            centers = [(int(rng.integers(0, rows)), int(rng.integers(0, cols)))
+                       for _ in range(int(rng.integers(1, 4)))]
+            radius = float(rng.integers(0, 6))
+            value = int(rng.integers(1, 10)) if op == 0 else 0
+            merge = bool(rng.integers(0, 2))
+            changed = manager.paint(view, slice_idx, centers, radius, value, merge=merge)
+
+            plane = np.moveaxis(expected, axis, 0)[slice_idx]
+            i, j = np.ogrid[:rows, :cols]
+            for ci, cj in centers:
+                plane[(i - ci) ** 2 + (j - cj) ** 2 <= radius ** 2] = value
+            assert changed == np.count_nonzero(expected != before)
+            if changed:
+                if not (merge and undo_states):
+                    undo_states.append(before)
+                redo_states.clear()
+        elif op == 2 and len(manager.label_index):
+            label = int(rng.choice(manager.label_index.labels))
+            new_label = int(rng.integers(0, 10))
+            changed = manager.relabel(label, new_label)
+            expected[expected == label] = new_label
+            assert changed == np.count_nonzero(expected != before)
+            if changed:
+                undo_states.append(before)
+                redo_states.clear()
+        elif op == 3:
+            assert manager.undo() == bool(undo_states)
+            if undo_states:
+                redo_states.append(expected)
+                expected = undo_states.pop()
+        else:
+            assert manager.redo() == bool(redo_states)
+            if redo_states:
+                undo_states.append(expected)
+                expected = redo_states.pop()
+        assert_matches_rebuild(manager, expected)
+
+    while manager.undo():
+        pass
+    assert_matches_rebuild(manager, original)
+
+
+def test_paint_keeps_int32_dtype(tmp_path):
+    data = np.zeros(SHAPE, dtype=np.int32)
+    data[:5, :5, :5] = 7
+    path = str(tmp_path / 'labels.nii')
+    nib.save(nib.Nifti1Image(data, np.eye(4)), path)
+
+    manager = NiftiDataManager()
+    assert manager.load_file(path)
+    assert manager.paint('axial', 3, [(10, 10)], 2.0, 70000) > 0
+    assert manager._data_cache.dtype == np.int32
+    assert 70000 in manager.label_index.labels
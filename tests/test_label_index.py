@@ -0,0 +1,22 @@
+"""Label index of volumes whose label values span a wide range."""
+import numpy as np
+import nibabel as nib
+import pytest
+
+from nifti_utils import NiftiDataManager
+
+
+@pytest.mark.parametrize('sparse', [False, True])
+def test_wide_range_int32_labels(tmp_path, sparse):
+    data = np.zeros((30, 20, 12), dtype=np.int32)
+    data[1:4, 2:5, 3:6] = 5
+    data[10:12, 5:9, 0:2] = 2_000_000
+    path = str(tmp_path / 'labels.nii.gz')
+    nib.save(nib.Nifti1Image(data, np.eye(4)), path)
+
+    manager = NiftiDataManager(sparse=sparse)
+    assert manager.load_file(path)
+    index = manager.label_index
+    assert index.labels.tolist() == [5, 2_000_000]
+    assert index.counts.tolist() == [27, 16]
+    assert index.bbox(2_000_000) == ((10, 11), (5, 8), (0, 1))
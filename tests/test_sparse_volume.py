@@ -0,0 +1,92 @@
+"""BlockSparseVolume reads and writes against a dense array."""
+import numpy as np
+import pytest
+
+from sparse_volume import BlockSparseVolume, label_dtype
+
+SHAPE = (45, 38, 29)
+BLOCK_SIZE = 8
+
+
+def random_volume(rng: np.random.Generator) -> np.ndarray:
+    data = np.zeros(SHAPE, dtype=np.uint8)
+    for label in range(1, 6):
+        start = [int(rng.integers(0, n - 2)) for n in SHAPE]
+        size = [int(rng.integers(2, 12)) for _ in SHAPE]
+        data[tuple(slice(s, s + w) for s, w in zip(start, size))] = label
+    return data
+
+
+def random_key(rng: np.random.Generator) -> tuple:
+    key = []
+    for n in SHAPE:
+        kind = rng.integers(0, 3)
+        if kind == 0:
+            key.append(int(rng.integers(-n, n)))
+        elif kind == 1:
+            start, stop = sorted(int(v) for v in rng.integers(-n - 3, n + 3, size=2))
+            key.append(slice(start, stop))
+        else:
+            key.append(slice(None))
+    return tuple(key[:int(rng.integers(1, 4))])
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_slicing_matches_dense(seed):
+    rng = np.random.default_rng(seed)
+    dense = random_volume(rng)
+    volume = BlockSparseVolume.from_dataobj(dense, block_size=BLOCK_SIZE)
+    assert np.array_equal(np.asarray(volume), dense)
+    for _ in range(200):
+        key = random_key(rng)
+        assert np.array_equal(volume[key], dense[key]), key
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_writes_match_dense(seed):
+    rng = np.random.default_rng(seed)
+    dense = random_volume(rng).astype(np.int64)
+    volume = BlockSparseVolume.from_dataobj(dense.astype(np.uint8), block_size=BLOCK_SIZE)
+    for step in range(100):
+        count = int(rng.integers(0, 300))
+        flat = rng.choice(dense.size, size=count, replace=False)
+        coords = np.unravel_index(flat, SHAPE)
+        # Mostly small labels and erasing, sometimes one that needs a wider dtype
+        high = 1000 if step % 25 == 0 else 10
+        values = rng.integers(0, high, size=count)
+        volume[coords] = values
+        dense[coords] = values
+
+        gather = np.unravel_index(rng.integers(0, dense.size, size=500), SHAPE)
+        assert np.array_equal(volume[gather], dense[gather])
+        key = random_key(rng)
+        assert np.array_equal(volume[key], dense[key]), key
+    assert np.array_equal(np.asarray(volume), dense)
+    assert volume.min() == dense.min() and volume.max() == dense.max()
+
+
+def test_dtypes_stay_compact():
+    assert label_dtype(-3, 300) == np.int16
+    assert label_dtype(-3, 70000) == np.int32
+    data = np.zeros(SHAPE, dtype=np.float32)
+    data[:4, :4, :4] = -3
+    data[10, 10, 10] = 300
+    assert BlockSparseVolume.from_dataobj(data, block_size=BLOCK_SIZE).dtype == np.int16
+
+    data = np.zeros(SHAPE, dtype=np.int32)
+    data[0, 0, 0] = -70000
+    volume = BlockSparseVolume.from_dataobj(data, block_size=BLOCK_SIZE)
+    assert volume.dtype == np.int32
+    volume[np.array([5]), np.array([5]), np.array([5])] = 70000
+    assert volume.dtype == np.int32
+    assert volume[5, 5, 5] == 70000
+
+
+def test_rejects_unsupported_keys():
+    volume = BlockSparseVolume.from_dataobj(np.zeros(SHAPE, dtype=np.uint8), block_size=BLOCK_SIZE)
+    with pytest.raises(IndexError):
+        volume[::2]
+    with pytest.raises(IndexError):
+        volume[SHAPE[0]]
+    with pytest.raises(IndexError):
+        volume[0, 0, 0] = 1
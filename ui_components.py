@@ -5,6 +5,7 @@ from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
 import matplotlib.gridspec as gridspec
 from matplotlib.widgets import Slider
+from matplotlib.colors import ListedColormap
 from typing import Callable, Dict, Any
 import numpy as np
 
@@ -154,7 +155,7 @@ class ViewPanel:
         ax.clear()
         
         # Display data
-        ax.imshow(data.T, cmap=DISPLAY_CONFIG['cmap'],
+        ax.imshow(data.T, cmap=ListedColormap(DISPLAY_CONFIG['cmap_colors']),
                  norm=plt.Normalize(*DISPLAY_CONFIG['normalize_range']),
                  origin=DISPLAY_CONFIG['origin'],
                  interpolation=DISPLAY_CONFIG['interpolation'])
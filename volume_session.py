@@ -0,0 +1,80 @@
+import os
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from nifti_utils import NiftiDataManager
+
+class VolumeSession:
+    """Recently opened volumes kept loaded, bounded by a memory budget.
+
+    Each entry is a fully loaded NiftiDataManager, so its label index and
+    last label/slice positions survive switching between cases. The least
+    recently used volumes are dropped once the budget is exceeded; the most
+    recent one and volumes with unsaved edits are always kept.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._volumes: 'OrderedDict[str, Tuple[int, NiftiDataManager]]' = OrderedDict()
+
+    @staticmethod
+    def _key(file_path: str) -> str:
+        return os.path.abspath(file_path)
+
+    def get(self, file_path: str) -> Optional[NiftiDataManager]:
+        """Return the loaded volume for a path, or None if absent or stale.
+
+        Volumes with unsaved edits are returned even when the file changed
+        on disk; see changed_on_disk and discard.
+        """
+        key = self._key(file_path)
+        entry = self._volumes.get(key)
+        if entry is None:
+            return None
+        manager = entry[1]
+        if self.changed_on_disk(file_path) and not manager.modified:
+            del self._volumes[key]
+            return None
+        self._volumes.move_to_end(key)
+        return manager
+
+    def changed_on_disk(self, file_path: str) -> bool:
+        """Whether the file was modified or removed since it was loaded or saved."""
+        mtime, _ = self._volumes[self._key(file_path)]
+        return not os.path.exists(file_path) or os.stat(file_path).st_mtime_ns != mtime
+
+    def discard(self, file_path: str):
+        self._volumes.pop(self._key(file_path), None)
+
+    def modified(self) -> List[Tuple[str, NiftiDataManager]]:
+        """(path, volume) of every volume with unsaved edits, most recent first."""
+        return [(key, manager) for key, (_, manager) in reversed(self._volumes.items())
+                if manager.modified]
+
+    def add(self, file_path: str, manager: NiftiDataManager):
+        key = self._key(file_path)
+        # A volume saved under a new name now stands for that file only
+        for other in [k for k, (_, m) in self._volumes.items() if m is manager and k != key]:
+            del self._volumes[other]
+        self._volumes[key] = (os.stat(file_path).st_mtime_ns, manager)
+        self._volumes.move_to_end(key)
+        for old in list(self._volumes)[:-1]:
+            if self.memory_bytes <= self.max_bytes:
+                break
+            # Unsaved edits stay in memory even over budget
+            if not self._volumes[old][1].modified:
+                del self._volumes[old]
+
+    def paths(self) -> List[str]:
+        """Loaded volume paths, most recently used first."""
+        return list(reversed(self._volumes))
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(manager.memory_bytes for _, manager in self._volumes.values())
+
+    def __contains__(self, file_path: str) -> bool:
+        return self._key(file_path) in self._volumes
+
+    def __len__(self) -> int:
+        return len(self._volumes)